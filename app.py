@@ -2,14 +2,59 @@
 # This is the updated Flask application that reads data from the SQLite database.
 # It is memory-efficient and combines database logic with language translations.
 import os
+import time
 import sqlite3
-from flask import Flask, render_template, request, url_for, redirect, g
+from contextlib import contextmanager
+import mimetypes
+from flask import Flask, render_template, request, url_for, redirect, g, jsonify, abort, send_from_directory
 from urllib.parse import urlencode
 
+from scripts import metrics, deltas, warm_start, assets, query_log
+from scripts.database import ranking_query
+from scripts.search import search
+from scripts.trends import top_trending
+from scripts.rollups import series, sparkline_points
+from scripts import snapshots
+
 app = Flask(__name__)
 app.debug = True
 
-DATABASE = 'data/arxiv.db'
+DATABASE = os.getenv('DATABASE_PATH', 'data/arxiv.db')
+# Set SERVER_TIMING=1 to report per-request phase times (db, and db.<query> for each query,
+# paginate, serialize, render, compress) in a Server-Timing header (used by
+# benchmarks/loadtest.py). Off by default: it exposes timings to every client.
+SERVER_TIMING = os.getenv('SERVER_TIMING') == '1'
+# Set SLOW_QUERY_MS to log every query step slower than that, with its SQL, parameters and
+# EXPLAIN QUERY PLAN, to the "slow_queries" logger (stderr unless configured otherwise).
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS')) / 1000 if os.getenv('SLOW_QUERY_MS') else None
+# Set METRICS_ENDPOINT=1 to serve the request and query histograms at /metrics for Prometheus.
+# Each gunicorn worker keeps its own numbers; a scrape sees the worker that answers it.
+METRICS_ENDPOINT = os.getenv('METRICS_ENDPOINT') == '1'
+# The database is built from the dataset deltas in git at build time (`python -m scripts.deltas
+# apply`, see render.yaml); importing the app only reads it. APPLY_DELTAS=1 also applies new
+# deltas at startup, e.g. for local development; with several workers only use it together with
+# gunicorn's preload_app, so one process writes the database. DELTA_DIR='' serves DATABASE as it is.
+APPLY_DELTAS = os.getenv('APPLY_DELTAS') == '1'
+DELTA_DIR = os.getenv('DELTA_DIR', deltas.DELTA_DIR)
+APPLIED_DELTAS = deltas.apply_deltas(DATABASE, DELTA_DIR) if APPLY_DELTAS and DELTA_DIR else []
+# Snapshot of the date list and the default ranking (see scripts/warm_start.py), written by the
+# build and by dataset_update.py. With gunicorn's preload_app it is loaded once in the master and
+# shared by the workers. A missing or stale snapshot is ignored (the app queries the database
+# instead), unless APPLY_DELTAS just changed the database: then it is rebuilt along with it.
+# WARM_START='' disables it.
+WARM_START = os.getenv('WARM_START', warm_start.WARM_START_PATH)
+WARM_STATE = None
+if WARM_START and os.path.exists(DATABASE):
+    WARM_STATE = warm_start.current(warm_start.load(WARM_START), DATABASE)
+    if WARM_STATE is None and APPLIED_DELTAS:
+        WARM_STATE = warm_start.build(DATABASE, WARM_START)
+# Responses are gzip/brotli compressed for clients that accept it; COMPRESSION=0 leaves that
+# to a proxy in front of the app. SVG_SPRITES=0 turns off the inline icon de-duplication.
+COMPRESSION = os.getenv('COMPRESSION', '1') == '1'
+SVG_SPRITES = os.getenv('SVG_SPRITES', '1') == '1'
+# Fingerprinted static files from `python -m scripts.assets`; without a build, asset_url()
+# falls back to the plain /static/ URLs.
+ASSET_MANIFEST = assets.load_manifest()
 
 TRANSLATIONS = {
     'en': {
@@ -19,7 +64,13 @@ TRANSLATIONS = {
         'day': 'Day', 'days': 'Days', 'year': 'Year', 'title': 'Title', 'links': 'Links',
         'showing': 'Showing', 'to': 'to', 'of': 'of', 'results': 'results', 'page': 'Page',
         'prev': 'Prev', 'next': 'Next', 'no_data': 'No data available for this date.',
-        'prev_day': 'Previous Day', 'next_day': 'Next Day', 'error_no_db': 'Database not found. Please run the update script.'
+        'prev_day': 'Previous Day', 'next_day': 'Next Day', 'error_no_db': 'Database not found. Please run the update script.',
+        'search': 'Search', 'search_placeholder': 'Title, abstract or repo', 'min_stars': 'Min. Stars',
+        'published_from': 'Published From', 'published_to': 'Published To', 'category': 'Category',
+        'relevance': 'Relevance', 'published': 'Published', 'no_results': 'No papers match your search.',
+        'trending': 'Trending', 'day_history': 'Daily (last 3 months)', 'week_history': 'Weekly',
+        'month_history': 'Monthly', 'no_history': 'No star history yet.', 'last_updated': 'Last updated',
+        'repos_tracked': 'repos tracked'
     },
     'zh': {
         'page_title': 'Star 历史查看器', 'main_header': '论文 Star 排行榜',
@@ -28,7 +79,13 @@ TRANSLATIONS = {
         'day': '天', 'days': '天', 'year': '年', 'title': '标题', 'links': '链接',
         'showing': '显示', 'to': '到', 'of': '，共', 'results': '条结果', 'page': '第',
         'prev': '上一页', 'next': '下一页', 'no_data': '选定日期无可用数据。',
-        'prev_day': '前一天', 'next_day': '后一天', 'error_no_db': '数据库未找到，请先运行更新脚本。'
+        'prev_day': '前一天', 'next_day': '后一天', 'error_no_db': '数据库未找到，请先运行更新脚本。',
+        'search': '搜索', 'search_placeholder': '标题、摘要或仓库', 'min_stars': '最少收藏数',
+        'published_from': '发布起始', 'published_to': '发布截止', 'category': '分类',
+        'relevance': '相关度', 'published': '发布时间', 'no_results': '没有符合条件的论文。',
+        'trending': '热门趋势', 'day_history': '每日（近三个月）', 'week_history': '每周',
+        'month_history': '每月', 'no_history': '暂无收藏历史。', 'last_updated': '最后更新',
+        'repos_tracked': '个仓库'
     }
 }
 
@@ -38,7 +95,7 @@ def get_db():
     if 'db' not in g:
         if not os.path.exists(DATABASE):
             return None # Return None if the database file does not exist
-        g.db = sqlite3.connect(DATABASE)
+        g.db = sqlite3.connect(DATABASE, factory=query_log.RecordingConnection if SLOW_QUERY_SECONDS is not None else sqlite3.Connection)
         g.db.row_factory = sqlite3.Row
     return g.db
 
@@ -49,16 +106,113 @@ def close_db(exception):
     if db is not None:
         db.close()
 
+# --- Request Metrics ---
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.phases = {}
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the with-block to the current request's `name` phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.phases[name] = g.phases.get(name, 0) + time.perf_counter() - start
+
+@contextmanager
+def query(name):
+    """
+    Time a database step: into the "db" phase and its own "db.<name>" phase, the
+    db_query_seconds histogram, and the slow-query log when it takes longer than SLOW_QUERY_MS.
+    """
+    db = g.get('db')
+    recording = SLOW_QUERY_SECONDS is not None and isinstance(db, query_log.RecordingConnection)
+    if recording:
+        db.statements = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for key in ("db", f"db.{name}"):
+            g.phases[key] = g.phases.get(key, 0) + elapsed
+        metrics.observe("db_query_seconds", elapsed, query=name)
+        if recording:
+            statements, db.statements = db.statements, None
+            if elapsed >= SLOW_QUERY_SECONDS:
+                metrics.inc("db_slow_queries_total", query=name)
+                query_log.log_slow(db, name, elapsed, statements, route=request.endpoint,
+                                   variant=g.get('variant'), url=request.full_path)
+
+@app.after_request
+def record_request_time(response):
+    if 'request_start' in g:
+        elapsed = time.perf_counter() - g.request_start
+        metrics.observe("http_server_request_seconds", elapsed, route=request.endpoint or "unknown",
+                        variant=g.get('variant', ''), status=response.status_code)
+        if SERVER_TIMING:
+            timings = [*g.phases.items(), ("total", elapsed)]
+            response.headers['Server-Timing'] = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings)
+    return response
+
+# Registered after record_request_time, so it runs first and its time is part of the total.
+@app.after_request
+def compress_response(response):
+    """De-duplicate repeated SVG icons in HTML pages and compress text responses."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in assets.COMPRESSIBLE_TYPES or 'phases' not in g):
+        return response
+    with phase("compress"):
+        if SVG_SPRITES and response.mimetype == 'text/html':
+            response.set_data(assets.dedupe_svg(response.get_data(as_text=True)))
+        if COMPRESSION:
+            response.vary.add('Accept-Encoding')
+            encoding = assets.choose_encoding(request.headers.get('Accept-Encoding'))
+            if encoding and response.content_length >= assets.MIN_COMPRESS_BYTES:
+                response.set_data(assets.compress(response.get_data(), encoding))
+                response.headers['Content-Encoding'] = encoding
+    return response
+
 # --- Jinja2 Context Processor ---
+def url_for_params(endpoint, **values):
+    """url_for that keeps the current query parameters, overriding the given ones."""
+    args = request.args.copy()
+    for key, value in values.items():
+        args[key] = value
+    return url_for(endpoint, **args)
+
 @app.context_processor
 def utility_processor():
     """Make helper functions available in templates."""
-    def url_for_params(endpoint, **values):
-        args = request.args.copy()
-        for key, value in values.items():
-            args[key] = value
-        return url_for(endpoint, **args)
-    return dict(url_for_params=url_for_params)
+    return dict(url_for_params=url_for_params, asset_url=asset_url)
+
+def asset_url(filename):
+    """URL of a file in static/: its fingerprinted copy when one has been built."""
+    if filename in ASSET_MANIFEST:
+        return url_for('fingerprinted_asset', filename=ASSET_MANIFEST[filename])
+    return url_for('static', filename=filename)
+
+def ranking_variant(sort_by, order_direction, growth_days, page, has_date):
+    """Low-cardinality name of a ranking request for the latency histograms, e.g. growth_7d_asc_page."""
+    variant = sort_by if sort_by in ("growth", "trending") else "stars"
+    if variant == "growth":
+        variant += f"_{growth_days}d" if growth_days in (1, 7, 30, 365) else "_other"
+    if order_direction == "ASC":
+        variant += "_asc"
+    if page > 1:
+        variant += "_page"
+    if has_date:
+        variant += "_date"
+    return variant
+
+def get_available_dates(db, warm):
+    """Check dates with star counts, newest first (one row per date in the snapshots table)."""
+    if warm is not None:
+        return warm["available_dates"]
+    with query("available_dates"):
+        return snapshots.available_dates(db)
 
 # --- Routes ---
 @app.route("/")
@@ -72,9 +226,10 @@ def index():
     if db is None:
         return render_template("index.html", error=T['error_no_db'], T=T, lang=lang)
 
+    # The warm-start snapshot answers the date list and the default ranking without a query.
+    warm = warm_start.current(WARM_STATE, DATABASE)
     cursor = db.cursor()
-    cursor.execute("SELECT DISTINCT check_date FROM star_counts ORDER BY check_date DESC")
-    available_dates = [row['check_date'] for row in cursor.fetchall()]
+    available_dates = get_available_dates(db, warm)
 
     if not available_dates:
         return render_template("index.html", data=[], available_dates=[], T=T, lang=lang, no_data=True)
@@ -89,71 +244,206 @@ def index():
 
     # --- 2. Build SQL Query ---
     order_direction = "ASC" if order.lower() == "asc" else "DESC"
-    sort_column = "growth" if sort_by == "growth" else "current_stars"
-
-    # CORRECTED QUERY: Use aliases (e.g., p.title AS "Title") to match the case
-    # expected by the HTML template. This fixes the missing titles and links.
-    query = f"""
-        SELECT
-            p.title AS "Title",
-            p.pdf_link AS "Pdf_Link",
-            p.github_link AS "Github_Link",
-            p.arxiv_id AS "Arxiv_ID",
-            s1.stars AS current_stars,
-            (s1.stars - IFNULL(s2.stars, s1.stars)) AS growth
-        FROM papers p
-        JOIN star_counts s1 ON p.id = s1.paper_id
-        LEFT JOIN star_counts s2 ON p.id = s2.paper_id AND s2.check_date = (
-            SELECT MAX(check_date)
-            FROM star_counts
-            WHERE paper_id = p.id AND check_date < DATE(?, '-{growth_days} days')
-        )
-        WHERE s1.check_date = ?
-        ORDER BY {sort_column} {order_direction}, current_stars DESC
-    """
+    sort_column = {"growth": "growth", "trending": "trend_score"}.get(sort_by, "current_stars")
+    start_index = (page - 1) * per_page
+    end_index = start_index + per_page
+    g.variant = ranking_variant(sort_by, order_direction, growth_days, page, 'date' in request.args)
 
-    cursor.execute(query, (selected_date, selected_date))
-    all_data = cursor.fetchall()
+    # Previous/next day, the "no data" check and the freshness line are primary key lookups
+    # on the snapshots table.
+    with query("navigation"):
+        snapshot, prev_date, next_date, last_updated = snapshots.navigation(db, selected_date)
+
+    cached = warm and warm_start.ranking_rows(warm, selected_date, growth_days, sort_column, order_direction, end_index)
+    if snapshot is None:
+        all_data, total_items = [], 0 # no star counts on that date: nothing to rank
+    elif cached:
+        all_data, total_items = cached
+    else:
+        with query("ranking"):
+            cursor.execute(ranking_query(growth_days, sort_column, order_direction), (selected_date, selected_date))
+            all_data = cursor.fetchall()
+        total_items = len(all_data)
 
     # --- 3. Pagination ---
-    total_items = len(all_data)
-    total_pages = (total_items + per_page - 1) // per_page
-    
-    if page > total_pages and total_pages > 0:
-        return redirect(url_for_params('index', page=total_pages))
+    with phase("paginate"):
+        total_pages = (total_items + per_page - 1) // per_page
 
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_data = all_data[start_index:end_index]
-
-    # --- 4. Previous/Next Day Navigation ---
-    prev_date, next_date = None, None
-    if selected_date in available_dates:
-        current_index = available_dates.index(selected_date)
-        if current_index < len(available_dates) - 1:
-            prev_date = available_dates[current_index + 1] # Dates are DESC
-        if current_index > 0:
-            next_date = available_dates[current_index - 1]
-
-    return render_template(
-        "index.html",
-        data=[dict(row) for row in paginated_data], # Convert rows to dicts
-        page=page,
-        total_pages=total_pages,
-        total_items=total_items,
-        start_index=start_index,
-        end_index=min(end_index, total_items),
-        sort_by=sort_by,
-        order=order,
-        date_cols=available_dates,
-        selected_date=selected_date,
-        growth_days=growth_days,
-        growth_col_name="growth", # For consistency in template
-        prev_date=prev_date,
-        next_date=next_date,
-        lang=lang,
-        T=T
+        if page > total_pages and total_pages > 0:
+            return redirect(url_for_params('index', page=total_pages))
+
+        paginated_data = all_data[start_index:end_index]
+
+    with phase("serialize"):
+        data = [dict(row) for row in paginated_data] # Convert rows to dicts
+
+    # Star history of every row on the page in one query, over the growth period (at least 30 days).
+    with query("sparklines"):
+        history = series(db, [row['paper_id'] for row in data], selected_date, max(growth_days, 30))
+    sparklines = {paper_id: sparkline_points([stars for _, stars in points]) for paper_id, points in history.items()}
+
+    with phase("render"):
+        return render_template(
+            "index.html",
+            data=data,
+            page=page,
+            total_pages=total_pages,
+            total_items=total_items,
+            start_index=start_index,
+            end_index=min(end_index, total_items),
+            sort_by=sort_by,
+            order=order,
+            date_cols=available_dates,
+            selected_date=selected_date,
+            growth_days=growth_days,
+            growth_col_name="growth", # For consistency in template
+            sparklines=sparklines, # paper_id -> points for the sparkline macro in _macros.html
+            prev_date=prev_date,
+            next_date=next_date,
+            no_data=snapshot is None,
+            snapshot=dict(snapshot) if snapshot else None, # row_count, repo_count, updated_at of the selected date
+            last_updated=last_updated,
+            lang=lang,
+            T=T
+        )
+
+@app.route("/search")
+def search_view():
+    db = get_db()
+    lang = request.args.get('lang', 'en')
+    if lang not in TRANSLATIONS:
+        lang = 'en'
+    T = TRANSLATIONS[lang]
+
+    if db is None:
+        return render_template("search.html", error=T['error_no_db'], T=T, lang=lang)
+
+    with query("latest_snapshot"):
+        latest = snapshots.latest(db)
+    params = dict(
+        text=request.args.get("q", "").strip(),
+        check_date=request.args.get("date", latest['check_date'] if latest else None),
+        growth_days=request.args.get("growth_days", 1, type=int),
+        min_stars=request.args.get("min_stars", type=int),
+        published_from=request.args.get("published_from") or None,
+        published_to=request.args.get("published_to") or None,
+        category=request.args.get("category", "").strip() or None,
+        sort=request.args.get("sort", "relevance"),
     )
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = 50
+    g.variant = (params["sort"] if params["sort"] in ("relevance", "stars", "growth", "published") else "other") + \
+        ("_text" if params["text"] else "_filters") + ("_page" if page > 1 else "")
+    searched = any(params[key] not in (None, "") for key in ("text", "min_stars", "published_from", "published_to", "category"))
+
+    data, total_items = [], 0
+    if searched:
+        with query("search"):
+            rows, total_items = search(db, page=page, per_page=per_page, **params)
+        if not rows and page > 1:
+            return redirect(url_for_params('search_view', page=1))
+        with phase("serialize"):
+            data = [dict(row) for row in rows]
+
+    start_index = (page - 1) * per_page
+    with phase("render"):
+        return render_template(
+            "search.html",
+            data=data,
+            searched=searched,
+            q=params["text"],
+            min_stars=params["min_stars"],
+            growth_days=params["growth_days"],
+            published_from=params["published_from"],
+            published_to=params["published_to"],
+            category=params["category"],
+            sort=params["sort"],
+            selected_date=params["check_date"],
+            last_updated=latest['updated_at'] if latest else None,
+            page=page,
+            total_pages=(total_items + per_page - 1) // per_page,
+            total_items=total_items,
+            start_index=start_index,
+            end_index=start_index + len(data),
+            lang=lang,
+            T=T
+        )
+
+@app.route("/api/trending")
+def trending_api():
+    """The k repos whose star gain today is furthest above their usual pace, with their papers."""
+    db = get_db()
+    if db is None:
+        return jsonify(error=TRANSLATIONS['en']['error_no_db']), 503
+    k = min(max(request.args.get("k", 20, type=int), 1), 100)
+    with query("top_trending"):
+        rows = top_trending(db, k, request.args.get("date"))
+    with phase("serialize"):
+        return jsonify([dict(row) for row in rows])
+
+@app.route("/paper/<arxiv_id>")
+def paper_view(arxiv_id):
+    db = get_db()
+    lang = request.args.get('lang', 'en')
+    if lang not in TRANSLATIONS:
+        lang = 'en'
+    T = TRANSLATIONS[lang]
+
+    if db is None:
+        return render_template("paper.html", error=T['error_no_db'], T=T, lang=lang)
+
+    with query("paper"):
+        paper = db.execute('''
+            SELECT p.*, r.owner || '/' || r.name AS repo, s1.stars AS current_stars,
+                   s1.stars - s2.stars AS growth_7d, t.score AS trend_score, s1.check_date AS latest_date
+            FROM papers p
+            LEFT JOIN repos r ON r.id = p.repo_id
+            LEFT JOIN star_counts s1 ON s1.paper_id = p.id
+                AND s1.check_date = (SELECT MAX(check_date) FROM star_counts WHERE paper_id = p.id)
+            LEFT JOIN star_counts s2 ON s2.paper_id = p.id
+                AND s2.check_date = (SELECT MAX(check_date) FROM star_counts WHERE paper_id = p.id AND check_date <= DATE(s1.check_date, '-7 days'))
+            LEFT JOIN repo_trends t ON t.repo_id = p.repo_id AND t.last_date = s1.check_date
+            WHERE p.arxiv_id = ?
+        ''', (arxiv_id,)).fetchone()
+    if paper is None:
+        abort(404)
+
+    charts = []
+    with query("paper_history"):
+        for period, days in (("day", 92), ("week", 730), ("month", 36500)):
+            points = series(db, [paper['id']], paper['latest_date'], days)[paper['id']] if paper['latest_date'] else []
+            charts.append({
+                "period": f"{period}_history", "width": 600, "height": 160,
+                "points": sparkline_points([stars for _, stars in points], 600, 160),
+                "first": points[0] if points else None, "last": points[-1] if points else None,
+            })
+
+    with phase("render"):
+        return render_template("paper.html", paper=dict(paper), charts=charts, T=T, lang=lang)
+
+@app.route("/metrics")
+def metrics_view():
+    """Request and query histograms of this worker in the Prometheus text format."""
+    if not METRICS_ENDPOINT:
+        abort(404)
+    return app.response_class(metrics.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/assets/<path:filename>")
+def fingerprinted_asset(filename):
+    """A fingerprinted static file, precompressed when the client accepts it. Cached for a year."""
+    available = tuple(encoding for encoding in assets.ENCODINGS
+                      if os.path.isfile(os.path.join(assets.DIST_DIR, f"{filename}.{'gz' if encoding == 'gzip' else encoding}")))
+    encoding = assets.choose_encoding(request.headers.get('Accept-Encoding'), available)
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+    response = send_from_directory(assets.DIST_DIR, filename + suffix,
+                                   mimetype=mimetypes.guess_type(filename)[0], max_age=365 * 24 * 3600)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if available:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    return response
 
 if __name__ == "__main__":
     if not os.path.exists('data'):
@@ -0,0 +1,108 @@
+# coldstart.py
+# Time to first byte of "/" after a cold start of gunicorn, with and without the warm-start
+# snapshot. Each run starts a fresh server process, so imports, delta checks and the first
+# queries are all counted.
+#
+#   python -m benchmarks.coldstart                                 # data/arxiv.db
+#   python -m benchmarks.coldstart --papers 50000 --days 365       # synthetic database
+#   git worktree add /tmp/before <commit> && python -m benchmarks.coldstart --app_dir /tmp/before
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import http.client
+
+from benchmarks.loadtest import free_port
+from benchmarks.synthetic_db import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def first_byte(port, deadline):
+    """Request "/" until the server answers; return the time the response headers arrived."""
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            arrived = time.perf_counter()
+            response.read()
+            conn.close()
+            return arrived, response.status
+        except (ConnectionError, http.client.HTTPException, OSError):
+            time.sleep(0.005)
+    raise RuntimeError("server did not answer")
+
+
+def cold_start(app_dir, db_path, warm_start_path, workers):
+    """Start gunicorn, return (seconds to first byte, seconds for the next request, status)."""
+    port = free_port()
+    env = {**os.environ, "DATABASE_PATH": db_path, "DELTA_DIR": "", "WARM_START": warm_start_path or ""}
+    command = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--log-level", "warning"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=app_dir, env=env, stdout=subprocess.DEVNULL)
+    try:
+        arrived, status = first_byte(port, start + 60)
+        second_start = time.perf_counter()
+        second, _ = first_byte(port, second_start + 60)
+        return arrived - start, second - second_start, status
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_seconds(app_dir, db_path):
+    """Time `import app` in a fresh interpreter (no snapshot, no deltas)."""
+    code = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+    env = {**os.environ, "DATABASE_PATH": db_path, "DELTA_DIR": "", "WARM_START": ""}
+    return float(subprocess.check_output([sys.executable, "-c", code], cwd=app_dir, env=env, text=True).split()[-1])
+
+
+def run(app_dir, db_path, repeat, workers, workdir):
+    warm_start_path = os.path.join(workdir, "warm_start.json")
+    # built up front, like the Render build does
+    subprocess.check_call([sys.executable, "-m", "scripts.warm_start", "--db", db_path, "--output", warm_start_path],
+                          cwd=ROOT, stdout=subprocess.DEVNULL)
+    report = {"import_seconds": statistics.median(import_seconds(app_dir, db_path) for _ in range(repeat))}
+    for mode, path in (("no_snapshot", None), ("snapshot", warm_start_path)):
+        runs = [cold_start(app_dir, db_path, path, workers) for _ in range(repeat)]
+        report[mode] = {
+            "ttfb_median_seconds": statistics.median(ttfb for ttfb, _, _ in runs),
+            "ttfb_max_seconds": max(ttfb for ttfb, _, _ in runs),
+            "second_request_median_seconds": statistics.median(second for _, second, _ in runs),
+            "status": runs[-1][2],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app_dir", type=str, default=ROOT, help="Checkout whose app.py is started (e.g. an older worktree).")
+    parser.add_argument("--db", type=str, default=os.path.join(ROOT, "data", "arxiv.db"))
+    parser.add_argument("--papers", type=int, default=0, help="Use a synthetic database with this many papers instead of --db.")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="githubstars-coldstart-")
+    try:
+        db_path = os.path.abspath(args.db)
+        if args.papers:
+            db_path = os.path.join(workdir, "synthetic.db")
+            generate(db_path, papers=args.papers, days=args.days)
+        report = run(os.path.abspath(args.app_dir), db_path, args.repeat, args.workers, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,55 @@
+# compare.py
+# Compare two benchmark result files from benchmarks.run and flag regressions.
+#
+#   python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+import sys
+import json
+import argparse
+
+
+def flatten(tree, prefix=""):
+    """Turn nested results into {"a.b.c": number} for every numeric leaf."""
+    values = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare(old, new, threshold):
+    """Return (rows, regressions) for every timing in both files. Timings are lower-is-better."""
+    old_values, new_values = flatten(old["benchmarks"]), flatten(new["benchmarks"])
+    rows, regressions = [], []
+    for key in sorted(old_values.keys() & new_values.keys()):
+        if not key.endswith("seconds") or not old_values[key]:
+            continue
+        ratio = new_values[key] / old_values[key]
+        rows.append((key, old_values[key], new_values[key], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old", type=str)
+    parser.add_argument("new", type=str)
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown ratio reported as a regression.")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old.get("params") != new.get("params"):
+        print(f"Warning: different parameters ({old.get('params')} vs {new.get('params')})")
+
+    rows, regressions = compare(old, new, args.threshold)
+    print(f"{'benchmark':70} {old['commit']:>10} {new['commit']:>10} {'ratio':>7}")
+    for key, old_value, new_value, ratio in rows:
+        flag = "  REGRESSION" if key in regressions else ""
+        print(f"{key:70} {old_value:10.4f} {new_value:10.4f} {ratio:7.2f}{flag}")
+    sys.exit(1 if regressions else 0)
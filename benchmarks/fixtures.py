@@ -0,0 +1,191 @@
+# fixtures.py
+# Offline stand-ins for everything the pipeline talks to: a corpus of sample PDFs, the
+# recorded arXiv Atom response and a fake HTTP server playing arXiv (API + PDFs) and
+# GitHub (REST + GraphQL).
+import io
+import os
+import re
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from pikepdf import Pdf, Dictionary, Name, Array, String
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+ATOM_FIXTURE = os.path.join(FIXTURES_DIR, "arxiv_atom.xml")
+
+# Where the project link sits in a sample PDF; the tiered scan handles each case differently.
+PDF_CASES = ("annotation", "first_page_text", "late_text", "references_only", "none")
+
+
+def make_pdf(pages, link_annotation=None):
+    """Build a PDF from a list of pages (each a list of text lines) and return its bytes."""
+    pdf = Pdf.new()
+    font = pdf.make_indirect(Dictionary(Type=Name.Font, Subtype=Name.Type1, BaseFont=Name.Helvetica))
+    for page_number, lines in enumerate(pages):
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        content = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+        page = pdf.add_blank_page(page_size=(612, 842))
+        page.obj.Resources = Dictionary(Font=Dictionary(F1=font))
+        page.obj.Contents = pdf.make_stream(content.encode("latin-1", errors="replace"))
+        if link_annotation and page_number == 0:
+            page.obj.Annots = pdf.make_indirect(Array([Dictionary(
+                Type=Name.Annot, Subtype=Name.Link, Rect=[40, 700, 300, 712],
+                A=Dictionary(S=Name.URI, URI=String(link_annotation)))]))
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def pdf_corpus(count=20, pages=12, seed=0):
+    """
+    Return a list of (paper_id, pdf_bytes, expected_link) covering every PDF_CASES layout.
+    expected_link is the paper's own repo, or None if it only cites other repos.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        case = PDF_CASES[i % len(PDF_CASES)]
+        paper_id = f"bench.{i:05d}"
+        link = f"https://github.com/lab{i}/project-{i}"
+        body = [[f"{rng.choice(['We', 'Our method', 'The model'])} improves results on task {line} of section {page}."
+                 for line in range(60)] for page in range(pages)]
+        body[0][:2] = [f"Sample paper {i}", "Abstract. We propose a method and evaluate it."]
+        annotation = None
+        if case == "annotation":
+            annotation = link
+            body[0][2] = "Code is available online."
+        elif case == "first_page_text":
+            body[0][2] = f"Code: {link}"
+        elif case == "late_text":
+            body[pages - 3][5] = f"Our implementation is released at {link}"
+        references = ["References", "[1] A. Author. Prior work. https://github.com/other/cited-work"]
+        corpus.append((paper_id, make_pdf(body + [references], annotation),
+                       None if case in ("references_only", "none") else link))
+    return corpus
+
+
+def load_atom_fixture():
+    with open(ATOM_FIXTURE, "rb") as f:
+        return f.read()
+
+
+class FakeServer:
+    """
+    Threaded HTTP server on localhost answering like arXiv and GitHub:
+      GET  /api/query              recorded Atom response
+      GET  /pdf/<id>               PDFs registered in `pdfs`
+      GET  /repos/<owner>/<name>   GitHub REST (301 for repos listed in `renamed`)
+      GET  /repositories/<id>      target of those redirects
+      POST /graphql                GitHub GraphQL nodes(ids: ...)
+    `latency` adds a fixed delay per request to mimic the network. With `rate_limit`, each
+    token gets that many GitHub calls per API before it is answered with a 403.
+    """
+
+    def __init__(self, repos=None, pdfs=None, renamed=None, latency=0.0, rate_limit=None):
+        self.repos = repos or {}      # node_id -> {"owner", "name", "stars", "id"}
+        self.pdfs = pdfs or {}        # paper id -> bytes
+        self.renamed = renamed or {}  # (owner, old name) lowercased -> node_id
+        self.latency = latency
+        self.atom = load_atom_fixture()
+        self.requests = 0
+        self.rate_limit = rate_limit
+        self.calls = {}               # (Authorization header, api) -> calls made
+        self._lock = threading.Lock()
+        self._by_name = {(repo["owner"].lower(), repo["name"].lower()): node_id for node_id, repo in self.repos.items()}
+        self._by_id = {str(repo["id"]): node_id for node_id, repo in self.repos.items()}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def repo_json(self, node_id):
+        repo = self.repos[node_id]
+        return {"id": repo["id"], "node_id": node_id, "name": repo["name"], "full_name": f"{repo['owner']}/{repo['name']}",
+                "owner": {"login": repo["owner"]}, "stargazers_count": repo["stars"]}
+
+    def take_call(self, authorization, api):
+        """Count a GitHub call; returns the rate-limit headers, or None if the token is spent."""
+        if self.rate_limit is None:
+            return {"X-RateLimit-Remaining": "4999"}
+        with self._lock:
+            used = self.calls.get((authorization, api), 0)
+            if used >= self.rate_limit:
+                return None
+            self.calls[(authorization, api)] = used + 1
+        return {"X-RateLimit-Remaining": str(self.rate_limit - used - 1), "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body, content_type="application/json", headers=None):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                path = self.path.split("?")[0]
+                if path == "/api/query":
+                    return self.send(200, server.atom, "application/atom+xml")
+                match = re.fullmatch(r"/pdf/(.+)", path)
+                if match and match.group(1) in server.pdfs:
+                    return self.send(200, server.pdfs[match.group(1)], "application/pdf")
+                match = re.fullmatch(r"/repos/([^/]+)/([^/]+)", path)
+                if match:
+                    limit_headers = server.take_call(self.headers.get("Authorization"), "rest")
+                    if limit_headers is None:
+                        return self.rate_limited()
+                    key = (match.group(1).lower(), match.group(2).lower())
+                    if key in server.renamed:
+                        repo_id = server.repos[server.renamed[key]]["id"]
+                        return self.send(301, {"message": "Moved Permanently"},
+                                         headers={"Location": f"{server.url}/repositories/{repo_id}", **limit_headers})
+                    if key in server._by_name:
+                        return self.send(200, server.repo_json(server._by_name[key]), headers=limit_headers)
+                match = re.fullmatch(r"/repositories/(\d+)", path)
+                if match and match.group(1) in server._by_id:
+                    return self.send(200, server.repo_json(server._by_id[match.group(1)]))
+                self.send(404, {"message": "Not Found"})
+
+            def do_POST(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path != "/graphql":
+                    return self.send(404, {"message": "Not Found"})
+                limit_headers = server.take_call(self.headers.get("Authorization"), "graphql")
+                if limit_headers is None:
+                    return self.rate_limited()
+                nodes = []
+                for node_id in payload["variables"]["ids"]:
+                    repo = server.repos.get(node_id)
+                    nodes.append(repo and {"id": node_id, "name": repo["name"], "owner": {"login": repo["owner"]},
+                                           "stargazerCount": repo["stars"]})
+                self.send(200, {"data": {"nodes": nodes}}, headers=limit_headers)
+
+            def rate_limited(self):
+                self.send(403, {"message": "API rate limit exceeded"},
+                          headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 3600)})
+
+        return Handler
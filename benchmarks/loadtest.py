@@ -0,0 +1,239 @@
+# loadtest.py
+# Replay a realistic mix of "/" requests against the viewer and report throughput and
+# p50/p95/p99 latency per route variant, split into DB / render / serialize / compress time from the
+# app's Server-Timing header.
+#
+#   python -m benchmarks.loadtest                                   # synthetic DB, gunicorn, 1/4/16 clients
+#   python -m benchmarks.loadtest --papers 50000 --days 365 --workers 4 --threads 2
+#   python -m benchmarks.loadtest --url http://127.0.0.1:5555 --concurrency 8   # an already running app
+#   python -m benchmarks.loadtest --slo_p95 0.3 --output load.json  # exit 1 if a variant misses the SLO
+import os
+import sys
+import json
+import time
+import random
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.synthetic_db import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("db", "render", "serialize", "compress")
+
+
+def request_mix(dates, count, max_page=40, zh_ratio=0.3, seed=0):
+    """
+    Return `count` (variant, path) pairs drawn from the traffic we expect: mostly the latest
+    ranking, then older dates, growth sorts over the selectable periods, and some deep pages.
+    """
+    rng = random.Random(seed)
+    variants = (
+        ("latest", 40, lambda: {}),
+        ("date", 15, lambda: {"date": rng.choice(dates)}),
+        ("growth", 20, lambda: {"sort_by": "growth", "growth_days": rng.choice((1, 7, 30, 365))}),
+        ("growth_asc", 5, lambda: {"sort_by": "growth", "order": "asc", "growth_days": rng.choice((1, 7, 30))}),
+        ("trending", 8, lambda: {"sort_by": "trending"}),
+        ("page", 12, lambda: {"page": rng.randint(2, 5)}),
+        ("deep_page", 8, lambda: {"page": rng.randint(6, max_page), "sort_by": rng.choice(("stars", "growth"))}),
+    )
+    names, weights = zip(*((name, weight) for name, weight, _ in variants))
+    factories = {name: factory for name, _, factory in variants}
+    mix = []
+    for _ in range(count):
+        name = rng.choices(names, weights)[0]
+        params = factories[name]()
+        if rng.random() < zh_ratio:
+            params["lang"] = "zh"
+            name += "/zh"
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        mix.append((name, "/?" + query if query else "/"))
+    return mix
+
+
+def parse_server_timing(header):
+    """'db;dur=1.20, render;dur=3.40' -> {"db": 0.0012, "render": 0.0034}"""
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, duration = part.strip().partition(";dur=")
+        if duration:
+            timings[name] = float(duration) / 1000
+    return timings
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_level(base_url, mix, concurrency):
+    """Send every request in mix with `concurrency` clients. Returns (samples, wall seconds)."""
+    local = threading.local()
+
+    def send(item):
+        variant, path = item
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = local.session.get(base_url + path, allow_redirects=False, timeout=60)
+            status, timing = response.status_code, parse_server_timing(response.headers.get("Server-Timing"))
+        except requests.RequestException:
+            status, timing = None, {}
+        return variant, status, time.perf_counter() - start, timing
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(send, mix))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall_seconds):
+    """Per-variant throughput, latency percentiles and mean phase breakdown."""
+    by_variant = {}
+    for variant, status, latency, timing in samples:
+        by_variant.setdefault(variant, []).append((status, latency, timing))
+        by_variant.setdefault("all", []).append((status, latency, timing))
+
+    report = {}
+    for variant, rows in sorted(by_variant.items()):
+        latencies = [latency for _, latency, _ in rows]
+        report[variant] = {
+            "requests": len(rows),
+            "errors": sum(1 for status, _, _ in rows if status is None or status >= 500),
+            "throughput_rps": len(rows) / wall_seconds,
+            "p50_seconds": percentile(latencies, 0.50),
+            "p95_seconds": percentile(latencies, 0.95),
+            "p99_seconds": percentile(latencies, 0.99),
+            "max_seconds": max(latencies),
+            # time spent in the app per phase (and per query, db.<query>); whatever is left of the
+            # latency is network and server queueing
+            "phase_mean_seconds": {phase: sum(timing.get(phase, 0) for _, _, timing in rows) / len(rows)
+                                   for phase in sorted(set(PHASES + ("total",)).union(*(timing for _, _, timing in rows)))},
+        }
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(db_path, server, workers, threads):
+    """Start app:app on a free port with Server-Timing enabled and wait until it answers."""
+    port = free_port()
+    env = {**os.environ, "DATABASE_PATH": db_path, "SERVER_TIMING": "1", "DELTA_DIR": ""}
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+                   "--workers", str(workers), "--threads", str(threads), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port),
+                   "--no-reload", "--no-debugger", "--with-threads"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{server} exited with code {process.returncode}")
+        try:
+            requests.get(base_url + "/", timeout=5)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{server} did not start within 30 seconds")
+
+
+def available_dates(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT DISTINCT check_date FROM star_counts ORDER BY check_date DESC")]
+
+
+def print_report(level_reports):
+    print(f"{'clients':>7} {'variant':18} {'req':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'db ms':>7} {'render':>7} {'serial':>7} {'compr':>7}")
+    for concurrency, report in level_reports.items():
+        for variant, row in report.items():
+            phases = row["phase_mean_seconds"]
+            print(f"{concurrency:>7} {variant:18} {row['requests']:>6} {row['errors']:>4} {row['throughput_rps']:8.1f} "
+                  f"{row['p50_seconds'] * 1000:8.1f} {row['p95_seconds'] * 1000:8.1f} {row['p99_seconds'] * 1000:8.1f} "
+                  f"{phases['db'] * 1000:7.1f} {phases['render'] * 1000:7.1f} {phases['serialize'] * 1000:7.1f} "
+                  f"{phases['compress'] * 1000:7.1f}")
+
+
+def slo_violations(level_reports, slo_p95=None, slo_p99=None):
+    violations = []
+    for concurrency, report in level_reports.items():
+        for variant, row in report.items():
+            if slo_p95 is not None and row["p95_seconds"] > slo_p95:
+                violations.append(f"{concurrency} clients, {variant}: p95 {row['p95_seconds']:.3f}s > {slo_p95}s")
+            if slo_p99 is not None and row["p99_seconds"] > slo_p99:
+                violations.append(f"{concurrency} clients, {variant}: p99 {row['p99_seconds']:.3f}s > {slo_p99}s")
+    return violations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", type=str, default=None, help="Load an already running app instead of starting one.")
+    parser.add_argument("--db", type=str, default=None, help="Database for the started app (default: a synthetic one).")
+    parser.add_argument("--papers", type=int, default=20000, help="Papers in the synthetic database.")
+    parser.add_argument("--days", type=int, default=90, help="Days of star history in the synthetic database.")
+    parser.add_argument("--server", choices=["gunicorn", "flask"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn worker processes.")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients, one run per value.")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo_p95", type=float, default=None, help="p95 latency objective in seconds.")
+    parser.add_argument("--slo_p99", type=float, default=None, help="p99 latency objective in seconds.")
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    workdir, process = None, None
+    db_path = args.db
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            if db_path is None:
+                workdir = tempfile.mkdtemp(prefix="githubstars-load-")
+                db_path = os.path.join(workdir, "synthetic.db")
+                print("Generating database:", generate(db_path, papers=args.papers, days=args.days, seed=args.seed))
+            process, base_url = start_app(os.path.abspath(db_path), args.server, args.workers, args.threads)
+
+        # Dates and page depth come from the database when we have it, otherwise stick to the latest ranking.
+        dates = available_dates(db_path) if db_path else []
+        mix = request_mix(dates or [""], args.requests + args.warmup, seed=args.seed)
+        if not dates:
+            mix = [(variant, path) for variant, path in mix if not variant.startswith("date")]
+
+        level_reports = {}
+        for concurrency in args.concurrency:
+            run_level(base_url, mix[:args.warmup], concurrency)
+            samples, wall_seconds = run_level(base_url, mix[args.warmup:], concurrency)
+            level_reports[concurrency] = summarize(samples, wall_seconds)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        if workdir:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+
+    print_report(level_reports)
+    violations = slo_violations(level_reports, args.slo_p95, args.slo_p99)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "levels": level_reports, "slo_violations": violations}, f, indent=2)
+    for violation in violations:
+        print("SLO violation:", violation)
+    sys.exit(1 if violations else 0)
@@ -0,0 +1,106 @@
+# page_weight.py
+# Transferred bytes and server time per page of the viewer, with the response optimizations
+# off ("before": plain HTML, every icon inline) and on ("after": SVG sprites + gzip/brotli).
+#
+#   python -m benchmarks.page_weight                          # synthetic DB, 20000 papers x 90 days
+#   python -m benchmarks.page_weight --db data/arxiv.db --output weight.json
+import os
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import tempfile
+import statistics
+
+# Configure logging before the scripts modules do, so benchmark runs don't append to logs/*.log.
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+os.environ.setdefault("DELTA_DIR", "")
+os.environ.setdefault("WARM_START", "")
+
+from benchmarks.synthetic_db import generate
+
+ACCEPT_ENCODINGS = {"identity": "identity", "gzip": "gzip", "br": "br, gzip"}
+
+
+def pages(db_path):
+    with sqlite3.connect(db_path) as conn:
+        arxiv_id = conn.execute("SELECT p.arxiv_id FROM papers p JOIN star_counts s ON s.paper_id = p.id LIMIT 1").fetchone()[0]
+    return {
+        "ranking": "/",
+        "ranking_growth_30d": "/?growth_days=30&sort_by=growth",
+        "ranking_zh": "/?lang=zh",
+        "search": "/search?q=learning&sort=stars",
+        "paper": f"/paper/{arxiv_id}",
+        "api_trending": "/api/trending?k=50",
+    }
+
+
+def measure(client, url, accept_encoding, repeat):
+    durations, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers={"Accept-Encoding": accept_encoding})
+        durations.append(time.perf_counter() - start)
+        size = len(response.data)
+    return {"bytes": size, "mean_seconds": statistics.mean(durations), "p50_seconds": sorted(durations)[len(durations) // 2]}
+
+
+def run(db_path, repeat):
+    import app as app_module
+    from scripts import assets
+    app_module.DATABASE = db_path
+    client = app_module.app.test_client()
+    report = {}
+    for name, url in pages(db_path).items():
+        report[name] = {}
+        for label, optimized in (("before", False), ("after", True)):
+            app_module.COMPRESSION = app_module.SVG_SPRITES = optimized
+            report[name][label] = {encoding: measure(client, url, header, repeat)
+                                   for encoding, header in ACCEPT_ENCODINGS.items()
+                                   if optimized or encoding == "identity"}
+    # The stylesheet the search and paper pages link, once per client thanks to the immutable cache.
+    with app_module.app.test_request_context():
+        css = app_module.asset_url("css/viewer.css")
+    report["viewer.css"] = {"after": {encoding: measure(client, css, header, 1) for encoding, header in ACCEPT_ENCODINGS.items()},
+                            "fingerprinted": bool(assets.load_manifest())}
+    return report
+
+
+def print_report(report):
+    print(f"{'page':20} {'before B':>9} {'before ms':>9} {'after B':>9} {'gzip B':>9} {'br B':>9} {'after ms':>9}")
+    for name, row in report.items():
+        before = row.get("before", {}).get("identity")
+        after = row["after"]
+        print(f"{name:20} {before['bytes'] if before else '-':>9} "
+              f"{before['mean_seconds'] * 1000 if before else 0:9.2f} {after['identity']['bytes']:>9} "
+              f"{after['gzip']['bytes']:>9} {after['br']['bytes']:>9} {after['br']['mean_seconds'] * 1000:9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=None, help="Database to serve (default: a synthetic one).")
+    parser.add_argument("--papers", type=int, default=20000, help="Papers in the synthetic database.")
+    parser.add_argument("--days", type=int, default=90, help="Days of star history in the synthetic database.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    workdir = None
+    db_path = args.db
+    if db_path is None:
+        workdir = tempfile.mkdtemp(prefix="githubstars-weight-")
+        db_path = os.path.join(workdir, "synthetic.db")
+        print("Generating database:", generate(db_path, papers=args.papers, days=args.days))
+    try:
+        report = run(os.path.abspath(db_path), args.repeat)
+    finally:
+        if workdir:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,102 @@
+# pdf_scan.py
+# Per-stage timing of the PDF link scan over a folder of cached arXiv PDFs.
+#
+#   python -m benchmarks.pdf_scan --pdf_dir pdf_cache --fetch 50   # cache 50 PDFs from data/arxiv.db first
+#   python -m benchmarks.pdf_scan --pdf_dir pdf_cache --output scan.json
+import os
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import statistics
+
+import requests
+
+# Configure logging before the scripts modules do, so benchmark runs don't append to logs/*.log.
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+from scripts.githublink_extractor import scan_pdf
+
+
+def fetch_pdfs(db_path, pdf_dir, count):
+    """Download the PDFs of the first `count` papers in the database into pdf_dir (skips cached ones)."""
+    os.makedirs(pdf_dir, exist_ok=True)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT arxiv_id, pdf_link FROM papers ORDER BY id LIMIT ?", (count,)).fetchall()
+    for arxiv_id, pdf_link in rows:
+        pdf_path = os.path.join(pdf_dir, f"{arxiv_id}.pdf")
+        if os.path.exists(pdf_path):
+            continue
+        response = requests.get(pdf_link)
+        if response.status_code == 200:
+            with open(pdf_path, "wb") as f:
+                f.write(response.content)
+        time.sleep(3) # arXiv asks for a delay between requests
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "mean": statistics.mean(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+    }
+
+
+def run(pdf_dir, modes, first_pages):
+    """Scan every PDF in pdf_dir with each mode. Returns per-mode stage timings and found counts."""
+    pdf_paths = sorted(os.path.join(pdf_dir, name) for name in os.listdir(pdf_dir) if name.endswith(".pdf"))
+    report = {"pdfs": len(pdf_paths), "first_pages": first_pages, "modes": {}}
+    found = {}
+    for mode in modes:
+        stages, total, found[mode] = {}, [], {}
+        for pdf_path in pdf_paths:
+            timings = {}
+            start = time.perf_counter()
+            try:
+                has_link, _ = scan_pdf(pdf_path, mode=mode, first_pages=first_pages, timings=timings)
+            except Exception as e:
+                print(f"{pdf_path}: {e}")
+                continue
+            total.append(time.perf_counter() - start)
+            found[mode][pdf_path] = has_link
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+        report["modes"][mode] = {
+            "total": summarize(total) if total else None,
+            "stages": {stage: summarize(values) for stage, values in stages.items()},
+            # each stage is timed once, so this stays just under 1
+            "stage_share": sum(map(sum, stages.values())) / sum(total) if total else None,
+            "with_github": sum(found[mode].values()),
+        }
+
+    if len(modes) > 1:
+        # papers on which the modes disagree, e.g. a link that only appears after the references
+        first, *others = modes
+        report["disagreements"] = {
+            other: sorted(path for path in found[first] if found[other].get(path) != found[first][path])
+            for other in others
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf_dir", type=str, default="pdf_cache", help="Folder with cached PDFs.")
+    parser.add_argument("--fetch", type=int, default=0, help="First download this many PDFs listed in the database.")
+    parser.add_argument("--db", type=str, default=os.path.join("data", "arxiv.db"))
+    parser.add_argument("--modes", nargs="+", default=["tiered", "full"], choices=["tiered", "full"])
+    parser.add_argument("--first_pages", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pdfs(args.db, args.pdf_dir, args.fetch)
+    report = run(args.pdf_dir, args.modes, args.first_pages)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
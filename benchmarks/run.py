@@ -0,0 +1,289 @@
+# run.py
+# Offline benchmark suite for every pipeline stage. Nothing leaves localhost: arXiv and GitHub
+# are played by benchmarks.fixtures.FakeServer, the LLM by StubBackend, and the database is
+# generated by benchmarks.synthetic_db.
+#
+#   python -m benchmarks.run                          # writes benchmarks/results/<commit>.json
+#   python -m benchmarks.run --papers 20000 --days 90
+#   python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import subprocess
+import logging
+from datetime import datetime
+
+# Configure logging before the scripts modules do, so benchmark runs don't append to logs/*.log.
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+from benchmarks.fixtures import FakeServer, pdf_corpus
+from benchmarks.synthetic_db import generate
+from scripts import metrics
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def timings_summary(values):
+    values = sorted(values)
+    return {
+        "runs": len(values),
+        "mean_seconds": statistics.mean(values),
+        "p50_seconds": values[len(values) // 2],
+        "p95_seconds": values[min(len(values) - 1, int(len(values) * 0.95))],
+    }
+
+
+def bench_crawl_paper_api(server, repeat):
+    from scripts import arxiv_scraper
+    arxiv_scraper.BASE_URL = server.url + "/api/query"
+    durations, papers = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        papers = arxiv_scraper.crawl_paper_api("cat:cs.AI", max_results=1000)
+        durations.append(time.perf_counter() - start)
+    return {**timings_summary(durations), "papers_per_call": len(papers),
+            "with_metadata_link": sum(1 for paper in papers if "github.com" in " ".join(paper[4:]))}
+
+
+def bench_pre_analyze(server, corpus, workdir):
+    from scripts.githublink_extractor import pre_analyze
+    results, texts = {}, {}
+    for mode in ("tiered", "full"):
+        durations, stages, correct = [], {}, 0
+        for paper_id, _, expected in corpus:
+            timings = {}
+            start = time.perf_counter()
+            has_link, text = pre_analyze(f"{server.url}/pdf/{paper_id}", pdf_path=os.path.join(workdir, "bench.pdf"),
+                                         mode=mode, timings=timings)
+            durations.append(time.perf_counter() - start)
+            # Each stage is timed once: together they can't take longer than the whole call.
+            assert sum(timings.values()) <= durations[-1] * 1.05 + 0.001, (paper_id, mode, timings, durations[-1])
+            for stage, seconds in timings.items():
+                stages[stage] = stages.get(stage, 0) + seconds
+            correct += bool(has_link) == (expected is not None)
+            if mode == "tiered" and has_link:
+                texts[paper_id] = text
+        results[mode] = {**timings_summary(durations), "stage_total_seconds": stages,
+                         "stage_share": sum(stages.values()) / sum(durations),
+                         "detection_accuracy": correct / len(corpus)}
+    return results, texts
+
+
+def bench_extract_github(corpus, texts):
+    from scripts.llm_backend import StubBackend, reduce_context
+    from scripts.githublink_extractor import extract_github_batch, STATUS_FOUND
+    contexts = [(paper_id, reduce_context(texts[paper_id])) for paper_id, _, _ in corpus if paper_id in texts]
+    expected = {paper_id: link for paper_id, _, link in corpus}
+    start = time.perf_counter()
+    outcomes = extract_github_batch(StubBackend(), contexts)
+    elapsed = time.perf_counter() - start
+    correct = 0
+    for paper_id, (status, link, _) in outcomes.items():
+        found = link.lower() if status == STATUS_FOUND else None
+        correct += found == (expected[paper_id].lower() if expected[paper_id] else None)
+    return {"mean_seconds": elapsed, "papers": len(contexts),
+            "context_chars": sum(len(context) for _, context in contexts),
+            "accuracy": correct / len(contexts) if contexts else None}
+
+
+def bench_update_star_counts(db_path, workdir, latency):
+    import dataset_update
+    results = {}
+    with sqlite3.connect(db_path) as conn:
+        repos = {node_id: {"id": repo_id, "owner": owner, "name": name, "stars": repo_id * 7}
+                 for repo_id, owner, name, node_id in conn.execute("SELECT id, owner, name, node_id FROM repos")}
+    # A few repos were renamed since they were recorded: REST answers those with a 301.
+    renamed = {(repo["owner"].lower(), f"old-{repo['name']}".lower()): node_id
+               for node_id, repo in list(repos.items())[::20]}
+
+    with FakeServer(repos=repos, renamed=renamed, latency=latency) as server:
+        from scripts import star_scraper
+        star_scraper.GITHUB_API_URL = server.url
+        dataset_update.GITHUB_API_KEYS = ["benchmark-token"]
+        for variant in ("graphql", "rest"):
+            run_db = os.path.join(workdir, f"stars_{variant}.db")
+            shutil.copyfile(db_path, run_db)
+            with sqlite3.connect(run_db) as conn:
+                if variant == "rest":
+                    conn.execute("UPDATE repos SET node_id = NULL")
+                    conn.executemany("UPDATE repos SET name = ? WHERE owner = ? AND name = ?",
+                                     [(old_name, owner, repos[node_id]["name"]) for (owner, old_name), node_id in renamed.items()])
+            dataset_update.DB_PATH = run_db
+            server.requests = 0
+            start = time.perf_counter()
+            dataset_update.update_star_counts()
+            elapsed = time.perf_counter() - start
+            with sqlite3.connect(run_db) as conn:
+                renamed_fixed = conn.execute("SELECT COUNT(*) FROM repos WHERE name LIKE 'old-%'").fetchone()[0] == 0
+            results[variant] = {"mean_seconds": elapsed, "api_requests": server.requests, "repos": len(repos),
+                                "renames_resolved": renamed_fixed}
+    return results
+
+
+def bench_star_refresh(db_path, workdir, latency):
+    """
+    REST-only refresh against a fake GitHub that allows each token a third of the repos:
+    one token stops short, three tokens finish, and so do three workers with two tokens each.
+    With no tokens every repo gets exactly one unauthenticated call. Then a worker that
+    crashed while holding a shard is taken over.
+    """
+    from scripts import star_scraper, star_refresh
+    with sqlite3.connect(db_path) as conn:
+        repos = {f"N{repo_id}": {"id": repo_id, "owner": owner, "name": name, "stars": repo_id * 7}
+                 for repo_id, owner, name in conn.execute("SELECT id, owner, name FROM repos")}
+    results = {}
+    with FakeServer(repos=repos, latency=latency, rate_limit=len(repos) // 3 + 1) as server:
+        star_scraper.GITHUB_API_URL = server.url
+        for name, tokens, workers in (("1_token", ["t0"], 1), ("3_tokens", ["t0", "t1", "t2"], 1),
+                                      ("6_tokens_3_workers", [f"t{i}" for i in range(6)], 3)):
+            run_db = os.path.join(workdir, f"refresh_{name}.db")
+            shutil.copyfile(db_path, run_db)
+            with sqlite3.connect(run_db) as conn:
+                conn.execute("UPDATE repos SET node_id = NULL")
+            server.calls.clear()
+            start = time.perf_counter()
+            refreshed, failed, pending = star_refresh.refresh_stars(run_db, tokens, workers, "2099-01-01")
+            results[name] = {"mean_seconds": time.perf_counter() - start, "repos": len(repos),
+                             "refreshed": refreshed, "failed": failed, "pending_shards": pending}
+
+        # No tokens: one unauthenticated attempt per repo, never a retry loop on the 403s.
+        run_db = os.path.join(workdir, "refresh_no_token.db")
+        shutil.copyfile(db_path, run_db)
+        server.calls.clear()
+        requests_before, start = server.requests, time.perf_counter()
+        refreshed, failed, pending = star_refresh.refresh_stars(run_db, [], 1, "2099-01-01")
+        api_calls = server.requests - requests_before
+        assert api_calls <= len(repos), f"{api_calls} GitHub calls for {len(repos)} repos without a token"
+        results["no_token"] = {"mean_seconds": time.perf_counter() - start, "repos": len(repos), "api_calls": api_calls,
+                               "refreshed": refreshed, "failed": failed, "pending_shards": pending}
+
+        # A worker died holding shard 0 with an expired lease: the next worker finishes it.
+        run_db = os.path.join(workdir, "refresh_takeover.db")
+        shutil.copyfile(os.path.join(workdir, "refresh_3_tokens.db"), run_db)
+        with sqlite3.connect(run_db) as conn:
+            conn.execute("UPDATE star_refresh_leases SET worker = 'crashed', done_at = NULL, expires_at = 0 WHERE shard = 0")
+            conn.commit()
+        server.calls.clear()
+        refreshed, failed, pending = star_refresh.refresh_stars(run_db, ["t9"], 1, "2099-01-01")
+        results["takeover"] = {"refreshed": refreshed, "failed": failed, "pending_shards": pending}
+    return results
+
+
+def bench_app_index(db_path, requests_per_variant):
+    import app as app_module
+    app_module.DATABASE = db_path
+    with sqlite3.connect(db_path) as conn:
+        arxiv_id = conn.execute("SELECT p.arxiv_id FROM papers p JOIN star_counts s ON s.paper_id = p.id LIMIT 1").fetchone()[0]
+    client = app_module.app.test_client()
+    variants = {
+        "default": "/",
+        "growth_7d": "/?growth_days=7&sort_by=growth",
+        "growth_365d_asc": "/?growth_days=365&sort_by=growth&order=asc",
+        "trending": "/?sort_by=trending",
+        "api_trending": "/api/trending?k=20",
+        "paper_detail": f"/paper/{arxiv_id}",
+        "deep_page": "/?page=20",
+        "zh": "/?lang=zh",
+    }
+    results = {}
+    for name, url in variants.items():
+        metrics.reset()
+        durations, status = [], None
+        for _ in range(requests_per_variant):
+            start = time.perf_counter()
+            response = client.get(url)
+            durations.append(time.perf_counter() - start)
+            status = response.status_code
+        queries = {row["labels"]["query"]: row["sum"] / row["count"]
+                   for row in metrics.snapshot()["histograms"] if row["name"] == "db_query_seconds"}
+        results[name] = {**timings_summary(durations), "status": status, "db_query_mean_seconds": queries}
+    return results
+
+
+def bench_search(db_path, repeat):
+    from scripts.search import search, update_search_index
+    queries = {
+        "text": {"text": "graph"},
+        "text_min_stars": {"text": "graph", "min_stars": 50, "sort": "stars"},
+        "text_growth": {"text": "agent", "sort": "growth", "growth_days": 7},
+        "filters_only": {"category": "cs.LG", "min_stars": 10, "sort": "stars"},
+        "deep_page": {"text": "learning", "page": 20},
+    }
+    results = {}
+    with sqlite3.connect(db_path) as conn:
+        check_date = conn.execute("SELECT MAX(check_date) FROM star_counts").fetchone()[0]
+        start = time.perf_counter()
+        update_search_index(conn) # nothing changed: the cost of the incremental check alone
+        results["index_noop_update_seconds"] = time.perf_counter() - start
+        for name, params in queries.items():
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _, total = search(conn, check_date=check_date, **params)
+                durations.append(time.perf_counter() - start)
+            results[name] = {**timings_summary(durations), "matches": total}
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(papers, days, pdfs, repeat, latency):
+    workdir = tempfile.mkdtemp(prefix="githubstars-bench-")
+    try:
+        db_path = os.path.join(workdir, "synthetic.db")
+        start = time.perf_counter()
+        db_info = generate(db_path, papers=papers, days=days)
+        db_info["generate_seconds"] = time.perf_counter() - start
+
+        corpus = pdf_corpus(pdfs)
+        benchmarks = {}
+        with FakeServer(pdfs={paper_id: pdf for paper_id, pdf, _ in corpus}, latency=latency) as server:
+            benchmarks["crawl_paper_api"] = bench_crawl_paper_api(server, repeat)
+            benchmarks["pre_analyze"], texts = bench_pre_analyze(server, corpus, workdir)
+        benchmarks["extract_github"] = bench_extract_github(corpus, texts)
+        benchmarks["update_star_counts"] = bench_update_star_counts(db_path, workdir, latency)
+        benchmarks["star_refresh"] = bench_star_refresh(db_path, workdir, latency)
+        benchmarks["app_index"] = bench_app_index(db_path, repeat)
+        benchmarks["search"] = bench_search(db_path, repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "params": {"papers": papers, "days": days, "pdfs": pdfs, "repeat": repeat, "latency": latency},
+        "database": db_info,
+        "benchmarks": benchmarks,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=2000, help="Papers in the synthetic database.")
+    parser.add_argument("--days", type=int, default=30, help="Days of star history in the synthetic database.")
+    parser.add_argument("--pdfs", type=int, default=20, help="Sample PDFs to scan.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for the fast benchmarks.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated network latency per request (seconds).")
+    parser.add_argument("--output", type=str, default=None, help="Result file (default: benchmarks/results/<commit>.json).")
+    args = parser.parse_args()
+
+    result = run(args.papers, args.days, args.pdfs, args.repeat, args.latency)
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result["benchmarks"], indent=2))
+    print(f"Results written to {output}")
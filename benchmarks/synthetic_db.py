@@ -0,0 +1,97 @@
+# synthetic_db.py
+# Generate an arxiv.db with the production schema and a configurable number of papers x days,
+# for benchmarks and load tests that must not depend on the real dataset.
+#
+#   python -m benchmarks.synthetic_db --papers 20000 --days 365 --output /tmp/large.db
+import os
+import random
+import sqlite3
+import argparse
+from datetime import date, datetime, timedelta
+
+from scripts.database import initialize_database
+from scripts.search import update_search_index
+from scripts.trends import update_trends
+from scripts.rollups import update_rollups
+from scripts.snapshots import update_snapshots
+
+WORDS = ("learning", "language", "model", "graph", "agent", "reasoning", "diffusion", "vision",
+         "transformer", "efficient", "robust", "benchmark", "multimodal", "retrieval", "policy",
+         "federated", "causal", "neural", "scaling", "alignment", "planning", "memory", "sparse")
+CATEGORIES = ("cs.AI", "cs.LG", "cs.CL", "cs.CV", "cs.RO", "stat.ML")
+
+
+def generate(db_path, papers=2000, days=30, github_ratio=0.3, shared_ratio=0.05, end_date=None, seed=0):
+    """
+    Create db_path with `papers` papers, about github_ratio of them with a repo (shared_ratio of
+    those pointing at a repo another paper already uses), and one star count per repo per day
+    for `days` days ending at end_date. Star histories are random walks with occasional spikes.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    initialize_database(db_path)
+
+    paper_rows, repos, paper_repo = [], [], []
+    for i in range(papers):
+        published = datetime.combine(end_date - timedelta(days=days + rng.randrange(365)), datetime.min.time())
+        arxiv_id = f"{published:%y%m}.{i:05d}"
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize()
+        abstract = " ".join(rng.choice(WORDS) for _ in range(120))
+        github_link, status = None, rng.choice(["not_found", "not_found", "ambiguous"])
+        if rng.random() < github_ratio:
+            if repos and rng.random() < shared_ratio:
+                repo_index = rng.randrange(len(repos))
+            else:
+                repo_index = len(repos)
+                repos.append((f"owner{repo_index}", f"repo-{repo_index}"))
+            github_link, status = "https://github.com/{}/{}".format(*repos[repo_index]), "found"
+            paper_repo.append((i + 1, repo_index + 1))
+        categories = " ".join(dict.fromkeys(["cs.AI"] + rng.sample(CATEGORIES, rng.randint(0, 2))))
+        paper_rows.append((i + 1, arxiv_id, title, f"https://arxiv.org/pdf/{arxiv_id}",
+                           published.strftime("%Y-%m-%dT%H:%M:%SZ"), github_link, abstract, categories, status, 1))
+
+    star_rows = []
+    for repo_index in range(len(repos)):
+        stars = int(rng.paretovariate(1.2) * 5)
+        history = []
+        for day in range(days):
+            stars += max(0, int(rng.gauss(stars * 0.002, 1 + stars * 0.001)))
+            if rng.random() < 0.002:
+                stars += rng.randint(100, 3000) # went viral
+            history.append(stars)
+        star_rows.append(history)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO repos (id, owner, name, node_id) VALUES (?, ?, ?, ?)",
+                         [(i + 1, owner, name, f"R_{i + 1}") for i, (owner, name) in enumerate(repos)])
+        conn.executemany('''
+            INSERT INTO papers (id, arxiv_id, title, pdf_link, published_date, github_link, abstract,
+                                categories, extraction_status, extraction_attempts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', paper_rows)
+        conn.executemany("UPDATE papers SET repo_id = ? WHERE id = ?", [(repo_id, paper_id) for paper_id, repo_id in paper_repo])
+        dates = [(end_date - timedelta(days=days - 1 - day)).isoformat() for day in range(days)]
+        conn.executemany(
+            "INSERT INTO star_counts (paper_id, check_date, stars) VALUES (?, ?, ?)",
+            ((paper_id, dates[day], star_rows[repo_id - 1][day])
+             for paper_id, repo_id in paper_repo for day in range(days)),
+        )
+        conn.commit()
+        update_search_index(conn)
+        update_trends(conn)
+        update_rollups(conn)
+        update_snapshots(conn)
+    return {"papers": papers, "repos": len(repos), "papers_with_repo": len(paper_repo), "days": days}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--github_ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=os.path.join("data", "synthetic.db"))
+    args = parser.parse_args()
+    print(generate(args.output, papers=args.papers, days=args.days, github_ratio=args.github_ratio, seed=args.seed))
@@ -7,21 +7,43 @@ from tqdm import tqdm
 from datetime import date
 from dotenv import load_dotenv
 
-from scripts.githublink_extractor import extract_github
+from scripts.githublink_extractor import (pre_analyze, extract_github_batch, extract_github_batch_job,
+                                          next_extraction_state, STATUS_FOUND, STATUS_RETRY, STATUS_NOT_FOUND)
+from scripts.llm_backend import BackendConfigError
+from scripts.source_discovery import discover_github_link
+from scripts.llm_backend import GeminiBackend, StubBackend, reduce_context
 from scripts.arxiv_scraper import arxiv_scraper
-from scripts.star_scraper import crawl_star
+from scripts.star_refresh import refresh_stars, load_tokens
+from scripts.database import initialize_database, link_papers_to_repos
+from scripts.deltas import apply_deltas, state_before_run, write_delta, DELTA_DIR
+from scripts import warm_start
+from scripts.search import update_search_index
+from scripts.trends import update_trends
+from scripts.rollups import update_rollups
+from scripts.snapshots import update_snapshots, dates_of_papers
+from scripts import metrics
 from datetime import datetime, timedelta
 
 import argparse
 parser = argparse.ArgumentParser()
 parser.add_argument("-s", "--start_date", type=str, default= None, help="The start time in yyyy-mm-dd format.")
 parser.add_argument("-e", "--end_date", type=str, default= None, help="The start time in yyyy-mm-dd format.")
-args = parser.parse_args()
+parser.add_argument("--llm", type=str, default="gemini", choices=["gemini", "stub"], help="Backend used to pick the GitHub link; 'stub' runs offline.")
+parser.add_argument("--latex", action="store_true", help="Also look for the GitHub link in the arXiv LaTeX source before parsing the PDF.")
+parser.add_argument("--batch_mode", action="store_true", help="Send the LLM requests through the Gemini Batch API (for large backfills).")
+parser.add_argument("--report", type=str, default=os.path.join("logs", "run_report.json"), help="Where to write the JSON run report.")
+parser.add_argument("--prometheus", type=str, default=None, help="Also write the run metrics as a Prometheus textfile here.")
+parser.add_argument("--star_workers", type=int, default=1, help="Processes refreshing star counts in parallel (see scripts/star_refresh.py).")
+parser.add_argument("--delta_dir", type=str, default=DELTA_DIR, help="Where the dataset deltas are read from and this run's delta is written.")
+# Only read the command line when run as a script; importing the module (e.g. from the
+# benchmarks) uses the defaults.
+args = parser.parse_args() if __name__ == "__main__" else parser.parse_args([])
 
 # --- Configuration & Setup ---
 load_dotenv()
 # Load environment variables (ensure they are set in .env or Render dashboard)
-GITHUB_API_KEY = os.getenv("STAR_API_KEY")
+# STAR_API_KEYS holds several tokens (comma separated), each with its own rate limit.
+GITHUB_API_KEYS = load_tokens()
 # ... add other initializations for your scrapers here ...
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 category = "cs.AI"
@@ -36,172 +58,210 @@ if args.end_date is None:
 else:
     end_date = args.end_date
 
-print(start_date)
-print(end_date)
 # The database will be stored on Render's persistent disk.
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "arxiv.db")
 
-def initialize_database():
-    """Create the database and tables if they don't exist."""
+def save_papers(papers):
+    """Insert or update the arXiv metadata of papers, leaving their extraction results alone."""
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
-        # Papers table: Stores general information about each paper.
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS papers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                arxiv_id TEXT UNIQUE NOT NULL,
-                title TEXT,
-                pdf_link TEXT,
-                published_date TEXT,
-                github_link TEXT
-            )
-        ''')
-        # Star Counts table: Stores star counts for each paper on different dates.
-        # This "long" format is much more scalable than adding a new column every day.
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS star_counts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                paper_id INTEGER,
-                check_date TEXT,
-                stars INTEGER,
-                FOREIGN KEY (paper_id) REFERENCES papers (id),
-                UNIQUE(paper_id, check_date)
-            )
-        ''')
-            # Create indexes if they don't exist
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_star_counts_date ON star_counts(check_date);")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_star_counts_paper ON star_counts(paper_id);")
-        
-        conn.commit()
+        # Use executemany for efficient bulk insertion.
+        with metrics.timer("db_write_seconds", table="papers"):
+            cursor.executemany('''
+            INSERT INTO papers (arxiv_id, title, pdf_link, published_date, abstract, comment, links, categories)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(arxiv_id) DO UPDATE SET
+            title = excluded.title,
+            pdf_link = excluded.pdf_link,
+            published_date = excluded.published_date,
+            abstract = excluded.abstract,
+            comment = excluded.comment,
+            links = excluded.links,
+            categories = excluded.categories
+            ''', papers)
+            conn.commit()
+
+def save_extractions(outcomes, attempts_by_id, now):
+    """Store the outcome of GitHub link extraction attempts, scheduling retries for transient failures."""
+    if not outcomes:
+        return
+    results = []
+    for arxiv_id, (status, github_link, error) in outcomes.items():
+        status, attempts, next_retry_at = next_extraction_state(status, attempts_by_id[arxiv_id], now)
+        metrics.inc("extraction_results_total", status=status)
+        results.append({
+            "arxiv_id": arxiv_id, "github_link": github_link, "status": status,
+            "attempts": attempts, "error": error, "next_retry_at": next_retry_at,
+        })
+
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        # A changed link has to be re-linked to its repo by update_star_counts.
+        with metrics.timer("db_write_seconds", table="papers"):
+            cursor.executemany('''
+            UPDATE papers SET
+            repo_id = CASE WHEN github_link IS :github_link THEN repo_id END,
+            github_link = :github_link,
+            extraction_status = :status,
+            extraction_attempts = :attempts,
+            extraction_error = :error,
+            next_retry_at = :next_retry_at
+            WHERE arxiv_id = :arxiv_id
+            ''', results)
+            conn.commit()
+    print(f"Database update complete. {len(results)} extraction results were saved.")
 
 def update_papers_from_arxiv():
     """
     Simulates arxiv_scraper.py and githublink_extractor.py.
     Fetches new papers, finds their GitHub links, and adds them to the database.
+    Papers whose extraction already reached a final answer are not processed again;
+    transient failures (from this or earlier runs) are retried once their backoff has passed.
     """
     print("Fetching new papers from ArXiv...")
-    
-    # --- Your scraping logic goes here ---
-    # Your arxiv_scraper.py should produce data in this format.
-    # new_papers_list = your_arxiv_scraper_function()
-    
-    # For demonstration, we'll use a sample of the data you provided.
 
     new_papers_list = arxiv_scraper( 
                 category=category,
                 start_date=start_date, 
                 end_date=end_date,
                 output= False)
-    # --- End of your scraping logic ---
     
     print(f"Found {len(new_papers_list)} new papers. Processing and adding to database...")
-    i =0
-    # Prepare data for insertion
-    papers_to_insert = []
-    for paper_data in tqdm(new_papers_list, desc="Processing papers"):
-        arxiv_id, title, pdf_link, published_date = paper_data
-        
-        # --- Your GitHub link extraction logic goes here ---
-        # Call your function to find the GitHub link for the paper.
-        # github_link = your_github_extractor_function(paper_data)
-        # For demonstration, we'll use a placeholder.
-        prompt1 = (
-        "I will provide an article about AI. I need you to find out the GitHub link for the article's project. "
-        "Do not provide any links that are cited or referenced. "
-        "Provide the link with this form: 'The Github Link is: https://...' or I didn't find the project link"
-    )
-        prompt2 = (
-        "The article ends. I need you to find out the GitHub link for the article's project. "
-        "Do not provide any links that are cited or referenced."
-    )
-        github_link = extract_github(prompt1, prompt2, api_key= GEMINI_API_KEY, pdf_url=pdf_link)
-        print(github_link)
-        if github_link is None:
-            github_link = "not_found"
-
-        # --- End of your GitHub link logic ---
-        
-        papers_to_insert.append((arxiv_id, title, pdf_link, published_date, github_link))
-        if i > 9:
-            with sqlite3.connect(DB_PATH) as conn:
-                cursor = conn.cursor()
-                # Use executemany for efficient bulk insertion.
-                # INSERT OR IGNORE prevents errors if a paper's arxiv_id already exists.
-
-                cursor.executemany('''
-                    INSERT INTO papers (arxiv_id, title, pdf_link, published_date, github_link)
-                    VALUES (?, ?, ?, ?, ?)
-                    ON CONFLICT(arxiv_id) DO UPDATE SET
-                    title = excluded.title,
-                    pdf_link = excluded.pdf_link,
-                    published_date = excluded.published_date,
-                    github_link = excluded.github_link
-                ''', papers_to_insert)
-                conn.commit()
-            print(f"Database update complete. {cursor.rowcount} new papers were added.")
-            papers_to_insert = []
-            i = 0
-        i += 1
-
-        
+    save_papers(new_papers_list)
+
+    now = datetime.now()
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
-        # Use executemany for efficient bulk insertion.
-        # INSERT OR IGNORE prevents errors if a paper's arxiv_id already exists.
+        cursor.execute('''
+            SELECT arxiv_id, pdf_link, abstract, comment, links, extraction_attempts FROM papers
+            WHERE extraction_status IS NULL
+            OR (extraction_status = ? AND (next_retry_at IS NULL OR next_retry_at <= ?))
+        ''', (STATUS_RETRY, now.isoformat(timespec="seconds")))
+        papers_to_extract = cursor.fetchall()
+    print(f"{len(papers_to_extract)} papers need GitHub link extraction.")
 
-        cursor.executemany('''
-            INSERT INTO papers (arxiv_id, title, pdf_link, published_date, github_link)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(arxiv_id) DO UPDATE SET
-            title = excluded.title,
-            pdf_link = excluded.pdf_link,
-            published_date = excluded.published_date,
-            github_link = excluded.github_link
-        ''', papers_to_insert)
-        conn.commit()
-        
-    print(f"Database update complete. {cursor.rowcount} new papers were added.")
+    attempts_by_id = {row[0]: row[-1] for row in papers_to_extract}
+    outcomes = {}  # arxiv_id -> (status, github_link, error), saved every few papers
+    contexts = []  # papers with a GitHub mention, waiting to be sent to the LLM together
+    llm_error = None # set when the backend is unusable; papers that need it are left for the next run
+    # Built when the first paper needs it, so a run without a key still does everything else.
+    backend = None
+
+    def make_backend():
+        nonlocal llm_error
+        try:
+            return StubBackend() if args.llm == "stub" else GeminiBackend(GEMINI_API_KEY)
+        except BackendConfigError as e:
+            llm_error = e
+            print(f"LLM backend unusable, leaving its papers for the next run: {e}")
+
+    def run_llm(contexts):
+        nonlocal llm_error
+        try:
+            if args.batch_mode:
+                outcomes.update(extract_github_batch_job(backend, contexts))
+            else:
+                outcomes.update(extract_github_batch(backend, contexts))
+        except BackendConfigError as e:
+            outcomes.update(e.outcomes) # answers that came back before the error
+            llm_error = e
+            print(f"LLM backend unusable, leaving its papers for the next run: {e}")
+
+    for arxiv_id, pdf_link, abstract, comment, links, _ in tqdm(papers_to_extract, desc="Processing papers"):
+        # Many papers name their repo in the abstract or comments: no PDF, no LLM call needed.
+        github_link = discover_github_link(arxiv_id, abstract, comment, links, use_latex=args.latex)
+        if github_link is not None:
+            metrics.inc("metadata_links_total")
+            outcomes[arxiv_id] = (STATUS_FOUND, github_link, None)
+        else:
+            # check whether the pdf contain links.
+            url_exist, text = pre_analyze(pdf_link)
+            if url_exist is None:
+                outcomes[arxiv_id] = (STATUS_RETRY, None, text)
+            elif not url_exist:
+                outcomes[arxiv_id] = (STATUS_NOT_FOUND, None, None)
+            elif llm_error is None:
+                contexts.append((arxiv_id, reduce_context(text)))
+
+        if contexts and backend is None:
+            backend = make_backend()
+        if llm_error is not None:
+            contexts = []
+        elif backend is not None and not args.batch_mode and len(contexts) >= backend.max_papers:
+            run_llm(contexts)
+            contexts = []
+        # Save progress regularly so an interrupted run doesn't lose finished papers.
+        if len(outcomes) > 9:
+            save_extractions(outcomes, attempts_by_id, now)
+            outcomes = {}
+
+    if contexts and llm_error is None:
+        run_llm(contexts)
+    save_extractions(outcomes, attempts_by_id, now)
 
 
 def update_star_counts():
     """
     Simulates star_scraper.py.
-    Gets all papers from the DB and updates their star counts for the current day.
+    Fetches the star count of every unique repo once and records it for the current day
+    on each paper that points at that repo. The repos are refreshed in shards by
+    args.star_workers processes, which split the tokens in GITHUB_API_KEYS between them.
     """
-    print("Updating star counts for all tracked papers...")
+    print("Updating star counts for all tracked repos...")
     with sqlite3.connect(DB_PATH) as conn:
-        # Fetch all papers we need to check.
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, github_link FROM papers WHERE github_link LIKE 'https://%'")
-        papers_to_check = cursor.fetchall()
-
-        today_str = date.today().isoformat()
-        print(today_str)
-        star_updates = []
-
-        print(f"Found {len(papers_to_check)} papers with GitHub links to update.")
-        for paper_id, github_link in tqdm(papers_to_check, desc="Checking GitHub links"):
-            # --- Your star scraping logic goes here ---
-            # Use the GITHUB_API_KEY to fetch the star count for github_link.
-            # Example: stars = your_star_scraper_function(github_link, GITHUB_API_KEY)
-            # For demonstration, we'll use a random number.
-            stars = crawl_star(github_link, token = GITHUB_API_KEY)
-            # --- End of your star scraping logic ---
-            if stars is not None:
-                star_updates.append((paper_id, today_str, stars))
-
-        # Use INSERT OR REPLACE to add today's count or update it if the script is run twice.
-        cursor.executemany('''
-            INSERT OR REPLACE INTO star_counts (paper_id, check_date, stars)
-            VALUES (?, ?, ?)
-        ''', star_updates)
-        conn.commit()
+        linked = link_papers_to_repos(conn)
+        print(f"Linked {len(linked)} papers to their repos.")
+        # Their earlier star counts now belong to a repo: recount repo_count of those dates.
+        relinked_dates = dates_of_papers(conn, linked)
+        if relinked_dates:
+            update_snapshots(conn, relinked_dates)
+
+    today_str = date.today().isoformat()
+    print(today_str)
+    print(f"Refreshing with {len(GITHUB_API_KEYS)} tokens and {args.star_workers} workers.")
+    # Shards finished earlier today (e.g. by a run that then failed) are not fetched again.
+    refreshed, failed, pending = refresh_stars(DB_PATH, GITHUB_API_KEYS, args.star_workers, today_str)
+    print(f"Refreshed {refreshed} repos, {failed} failed.")
+    if pending:
+        # Leases are kept per check date: only another run today picks these shards up again.
+        print(f"{pending} shards ran out of API budget; their repos have no count for {today_str}.")
+    with sqlite3.connect(DB_PATH) as conn:
+        update_snapshots(conn, [today_str], now=datetime.now().isoformat(timespec="seconds"))
     print("Star counts updated for today.")
 
 
 if __name__ == "__main__":
-    initialize_database()
-    update_papers_from_arxiv()
-    update_star_counts()
+    print(start_date)
+    print(end_date)
+    # The database is not in git: rebuild/refresh it from the committed deltas first, then
+    # migrate what they brought in.
+    applied = apply_deltas(DB_PATH, args.delta_dir)
+    print(f"Applied {len(applied)} dataset delta files.")
+    initialize_database(DB_PATH)
+    with sqlite3.connect(DB_PATH) as conn:
+        before = state_before_run(conn)
+
+    with metrics.timer("stage_seconds", stage="papers"):
+        update_papers_from_arxiv()
+    with metrics.timer("stage_seconds", stage="stars"):
+        update_star_counts()
+    with metrics.timer("stage_seconds", stage="search_index"), sqlite3.connect(DB_PATH) as conn:
+        print(f"Search index: {update_search_index(conn)} papers (re)indexed.")
+    with metrics.timer("stage_seconds", stage="trends"), sqlite3.connect(DB_PATH) as conn:
+        print(f"Trends: {update_trends(conn)} days folded.")
+    with metrics.timer("stage_seconds", stage="rollups"), sqlite3.connect(DB_PATH) as conn:
+        print(f"Rollups: {update_rollups(conn)} weekly/monthly buckets updated.")
     print("Database update process finished.")
 
+    delta_path = write_delta(DB_PATH, before, args.delta_dir)
+    if delta_path:
+        metrics.set_gauge("delta_bytes", os.path.getsize(delta_path))
+        print(f"Changes written to {delta_path}.")
+    # Last step: any later write to the database would make the snapshot stale again.
+    warm_start.build(DB_PATH)
+
+    metrics.write_json_report(args.report, start_date=start_date, end_date=end_date)
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+    print(f"Run report written to {args.report}.")
+
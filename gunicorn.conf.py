@@ -0,0 +1,8 @@
+# gunicorn.conf.py
+# Picked up by `gunicorn app:app` when started from the repo root.
+import os
+
+# Import the app once in the master (load the warm-start snapshot, apply deltas if APPLY_DELTAS=1) and
+# fork the workers from it, instead of every worker paying for the startup on its own.
+preload_app = True
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
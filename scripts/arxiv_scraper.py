@@ -7,11 +7,13 @@ import time
 from datetime import datetime, timedelta
 import pandas as pd 
 import io
+
+from scripts import metrics
 # --- Configuration & Constants ---
 
 # BEST PRACTICE: Use constants for URLs and namespaces
 BASE_URL = "http://export.arxiv.org/api/query"
-ARXIV_NS = {'atom': 'http://www.w3.org/2005/Atom'}
+ARXIV_NS = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
 OPENSEARCH_NS = {'opensearch': 'http://a9.com/-/spec/opensearch/1.1/'}
 
 # BEST PRACTICE: Set up basic logging to a file
@@ -29,7 +31,7 @@ def get_total_results(search_query: str) -> int:
     """
     params = {'search_query': search_query, 'max_results': 1}
     try:
-        response = requests.get(BASE_URL, params=params)
+        response = metrics.http_get(BASE_URL, params=params)
         response.raise_for_status()
         root = ET.fromstring(response.content)
         total_results_tag = root.find('opensearch:totalResults', OPENSEARCH_NS)
@@ -51,7 +53,10 @@ def crawl_paper_api(search_query: str, max_results: int = 100, start: int = 0) -
         start (int): Starting index for pagination.
     
     Returns:
-        list: List of [title, pdf_url, published_date] lists.
+        list: List of [arxiv_id, title, pdf_url, published_date, abstract, comment, links, categories] lists.
+              `links` holds the entry's extra link hrefs, one per line; the abstract and
+              comment often already contain the paper's code link. `categories` is the
+              space-separated list of arXiv categories, primary category first.
     """
     papers = []
     params = {
@@ -63,7 +68,7 @@ def crawl_paper_api(search_query: str, max_results: int = 100, start: int = 0) -
     }
     
     try:
-        response = requests.get(BASE_URL, params=params)
+        response = metrics.http_get(BASE_URL, params=params)
         response.raise_for_status()
         root = ET.fromstring(response.content)
         entries = root.findall('.//atom:entry', ARXIV_NS)
@@ -78,7 +83,15 @@ def crawl_paper_api(search_query: str, max_results: int = 100, start: int = 0) -
             arxiv_id = arxiv_id_full.split('v')[0] # remove version e.g. v1
             pdf_url = f"https://arxiv.org/pdf/{arxiv_id}"
             published_date = entry.find('atom:published', ARXIV_NS).text.strip()
-            papers.append([arxiv_id,title, pdf_url, published_date])
+            abstract = entry.findtext('atom:summary', default='', namespaces=ARXIV_NS).strip()
+            comment = entry.findtext('arxiv:comment', default='', namespaces=ARXIV_NS).strip()
+            links = "\n".join(link.get('href') for link in entry.findall('atom:link', ARXIV_NS)
+                              if link.get('href') and 'arxiv.org' not in link.get('href'))
+            primary = entry.find('arxiv:primary_category', ARXIV_NS)
+            categories = [primary.get('term')] if primary is not None else []
+            categories += [category.get('term') for category in entry.findall('atom:category', ARXIV_NS)
+                           if category.get('term') not in categories]
+            papers.append([arxiv_id,title, pdf_url, published_date, abstract, comment, links, " ".join(categories)])
             
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to fetch papers (start={start}): {e}")
@@ -152,7 +165,7 @@ def arxiv_scraper(data_folder="data", category="cs.AI", start_date="2023-01-01",
             papers_crawled = []
             while True:
                 # BEST PRACTICE: Be a good citizen and don't spam the API
-                time.sleep(3) 
+                metrics.sleep(3, "arxiv_api")
                 
                 papers = crawl_paper_api(search_query, max_results=max_results_per_req, start=start_index)
                 print(papers)
@@ -162,7 +175,7 @@ def arxiv_scraper(data_folder="data", category="cs.AI", start_date="2023-01-01",
                 # Append results to the CSV
                     with open(csv_file_path, mode='a', newline='', encoding='utf-8') as file:
                         writer = csv.writer(file)
-                        writer.writerows(papers)
+                        writer.writerows(paper[:4] for paper in papers) # the CSV keeps its four original columns
                 papers_crawled.extend(papers)
                 
                 num_retrieved = len(papers)
@@ -192,7 +205,7 @@ def arxiv_scraper(data_folder="data", category="cs.AI", start_date="2023-01-01",
         if output:
             with open(csv_file_path, mode='a', newline='', encoding='utf-8') as file:
                         writer = csv.writer(file)
-                        writer.writerows(papers)
+                        writer.writerows(paper[:4] for paper in papers)
 
     if output:
         print(f"\nCrawl finished. Total papers saved: {total_papers_crawled}")
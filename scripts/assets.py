@@ -0,0 +1,154 @@
+# assets.py
+# Keeps what the viewer sends small:
+#
+#   - build() copies every file in static/ to static/dist/ under a content-hashed name
+#     (css/viewer.css -> css/viewer.3f2a9c1d0b.css) with .gz and .br precompressed copies next
+#     to it, and writes a manifest the app uses to link them. A hashed URL never changes
+#     content, so the app serves them with an immutable one-year Cache-Control.
+#   - compress() / choose_encoding() gzip or brotli the dynamic responses.
+#   - dedupe_svg() turns inline SVG icons repeated on every table row into one <symbol>
+#     sprite plus a <use> reference per row.
+#
+#   python -m scripts.assets                  # rebuild static/dist (run by the Render build)
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+try:
+    import brotli
+except ImportError: # optional: without it everything is gzip only
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/plain", "application/javascript", "application/json", "image/svg+xml"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".txt", ".js", ".json", ".svg"}
+# Below this a compressed body is not meaningfully smaller than its headers.
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6    # per-request levels: the ratio gain past these costs more time than it saves bytes
+BROTLI_QUALITY = 5
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def _fingerprinted(relative_path, content):
+    stem, extension = os.path.splitext(relative_path)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{extension}"
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """
+    Write the fingerprinted and precompressed copies of static_dir to dist_dir and return the
+    manifest ({"css/viewer.css": "css/viewer.<hash>.css"}). Files of earlier builds are removed.
+    """
+    manifest = {}
+    staging_dir = dist_dir + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) not in (dist_dir, staging_dir)]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            relative_path = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                content = f.read()
+            manifest[relative_path] = _fingerprinted(relative_path, content)
+            target = os.path.join(staging_dir, manifest[relative_path])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(content)
+            if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                # Built once, so use the slowest, smallest settings.
+                with open(target + ".gz", "wb") as f:
+                    f.write(gzip.compress(content, 9, mtime=0))
+                if brotli:
+                    with open(target + ".br", "wb") as f:
+                        f.write(brotli.compress(content, quality=11))
+    with open(os.path.join(staging_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.replace(staging_dir, dist_dir)
+    return manifest
+
+
+def load_manifest(dist_dir=DIST_DIR):
+    """The manifest of the last build, or {} if static/dist has not been built."""
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def choose_encoding(accept_encoding, available=ENCODINGS):
+    """The first of `available` the Accept-Encoding header allows (q=0 excludes), or None."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip())
+    for encoding in available:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+SVG_PATTERN = re.compile(r"<svg\b([^>]*)>(.*?)</svg>", re.S)
+# Attributes that place the icon on the page; everything else belongs to the shared symbol.
+USE_ATTRIBUTES = re.compile(r'\s(?:width|height|class|style|aria-[\w-]+|role)="[^"]*"')
+VIEWBOX = re.compile(r'\sviewBox="[^"]*"')
+
+
+def dedupe_svg(html):
+    """
+    Replace inline <svg> elements that occur more than once with <use> references to a single
+    <symbol> each, defined in a hidden sprite at the start of <body>. Unique SVGs (the sparkline
+    of each row) are left alone.
+    """
+    counts = {}
+    for match in SVG_PATTERN.finditer(html):
+        counts[match.group(0)] = counts.get(match.group(0), 0) + 1
+    repeated = [svg for svg, count in counts.items() if count > 1]
+    if not repeated:
+        return html
+
+    symbols, ids = [], {}
+    for svg in repeated:
+        attributes, inner = SVG_PATTERN.fullmatch(svg).groups()
+        ids[svg] = "i" + hashlib.sha1(svg.encode()).hexdigest()[:8]
+        viewbox = VIEWBOX.search(attributes)
+        symbols.append(f'<symbol id="{ids[svg]}"{viewbox.group(0) if viewbox else ""}>{inner}</symbol>')
+
+    def use(match):
+        svg = match.group(0)
+        if svg not in ids:
+            return svg
+        placement = "".join(USE_ATTRIBUTES.findall(match.group(1)))
+        return f'<svg{placement}><use href="#{ids[svg]}"/></svg>'
+
+    html = SVG_PATTERN.sub(use, html)
+    sprite = f'<svg xmlns="http://www.w3.org/2000/svg" style="display:none">{"".join(symbols)}</svg>'
+    body = re.search(r"<body\b[^>]*>", html)
+    position = body.end() if body else 0
+    return html[:position] + sprite + html[position:]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--static_dir", type=str, default=STATIC_DIR)
+    parser.add_argument("--dist_dir", type=str, default=DIST_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir, args.dist_dir)
+    print(f"Fingerprinted {len(manifest)} static files into {args.dist_dir}.")
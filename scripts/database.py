@@ -0,0 +1,235 @@
+# database.py
+# Schema setup and small helpers shared by dataset_update.py and the other scripts.
+import sqlite3
+
+
+def _add_column(cursor, table, column, definition):
+    """
+    Add a column to an existing table if it is not there yet (simple migration).
+    Returns True if the column was added.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column in [row[1] for row in cursor.fetchall()]:
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def initialize_database(db_path):
+    """Create the database and tables if they don't exist."""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        # Papers table: Stores general information about each paper.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS papers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                arxiv_id TEXT UNIQUE NOT NULL,
+                title TEXT,
+                pdf_link TEXT,
+                published_date TEXT,
+                github_link TEXT
+            )
+        ''')
+        # Star Counts table: Stores star counts for each paper on different dates.
+        # This "long" format is much more scalable than adding a new column every day.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS star_counts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                paper_id INTEGER,
+                check_date TEXT,
+                stars INTEGER,
+                FOREIGN KEY (paper_id) REFERENCES papers (id),
+                UNIQUE(paper_id, check_date)
+            )
+        ''')
+        # Repos table: One row per unique GitHub repository. Several papers can point
+        # at the same repo, so star counts are fetched once per repo, not per paper.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS repos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL COLLATE NOCASE,
+                name TEXT NOT NULL COLLATE NOCASE,
+                node_id TEXT UNIQUE,
+                UNIQUE(owner, name)
+            )
+        ''')
+        _add_column(cursor, "papers", "repo_id", "INTEGER REFERENCES repos (id)")
+        # Atom entry fields, checked for a code link before the PDF is downloaded.
+        _add_column(cursor, "papers", "abstract", "TEXT")
+        _add_column(cursor, "papers", "comment", "TEXT")
+        _add_column(cursor, "papers", "links", "TEXT")
+        # Space-separated arXiv categories, primary first. Every paper so far came from the
+        # cs.AI query, so that is what older rows get.
+        if _add_column(cursor, "papers", "categories", "TEXT"):
+            cursor.execute("UPDATE papers SET categories = 'cs.AI'")
+
+        # Extraction status: see the STATUS_* constants in githublink_extractor.py.
+        migrate_status = _add_column(cursor, "papers", "extraction_status", "TEXT")
+        _add_column(cursor, "papers", "extraction_attempts", "INTEGER NOT NULL DEFAULT 0")
+        _add_column(cursor, "papers", "extraction_error", "TEXT")
+        _add_column(cursor, "papers", "next_retry_at", "TEXT")
+        if migrate_status:
+            # Older rows stored the outcome straight in github_link ("not_found",
+            # "github link uncorrect" or a raw error string); move it into the status columns.
+            cursor.execute('''
+                UPDATE papers SET
+                    extraction_status = CASE
+                        WHEN github_link LIKE 'https://%' THEN 'found'
+                        WHEN github_link IS NULL OR github_link = 'not_found' THEN 'not_found'
+                        ELSE 'retry' END,
+                    extraction_attempts = 1,
+                    extraction_error = CASE
+                        WHEN github_link NOT LIKE 'https://%' AND github_link != 'not_found' THEN github_link END,
+                    github_link = CASE WHEN github_link LIKE 'https://%' THEN github_link END
+                WHERE extraction_status IS NULL
+            ''')
+        # "github link uncorrect" meant the old regex saw several GitHub URLs in the model's
+        # answer, which is what the structured-output backends resolve: queue those papers
+        # again (rows migrated as 'ambiguous' before, or arriving that way from older deltas).
+        cursor.execute('''
+            UPDATE papers SET extraction_status = 'retry', next_retry_at = NULL
+            WHERE extraction_status = 'ambiguous' AND extraction_error = 'github link uncorrect'
+        ''')
+
+        # Running statistics of each repo's daily star gain, see trends.py.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS repo_trends (
+                repo_id INTEGER PRIMARY KEY REFERENCES repos (id),
+                last_date TEXT,
+                last_stars INTEGER,
+                velocity REAL,
+                acceleration REAL,
+                n INTEGER NOT NULL DEFAULT 0,
+                mean REAL NOT NULL DEFAULT 0,
+                m2 REAL NOT NULL DEFAULT 0,
+                score REAL
+            )
+        ''')
+
+        # Weekly/monthly star history per paper for charts, see rollups.py.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS star_rollups (
+                paper_id INTEGER NOT NULL REFERENCES papers (id),
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                stars INTEGER,
+                last_date TEXT,
+                PRIMARY KEY (paper_id, period, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+        # One row per check date with its size and when it was recorded, see snapshots.py.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                check_date TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL,
+                repo_count INTEGER NOT NULL,
+                created_at TEXT,
+                updated_at TEXT
+            ) WITHOUT ROWID
+        ''')
+
+        # Full-text index for the search page, one row per paper (rowid = papers.id).
+        # Kept up to date by search.update_search_index().
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts
+            USING fts5(title, abstract, repo, tokenize = 'porter unicode61')
+        ''')
+
+        # Create indexes if they don't exist
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_star_counts_date ON star_counts(check_date);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_star_counts_paper ON star_counts(paper_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_repo ON papers(repo_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_retry ON papers(extraction_status, next_retry_at);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_published ON papers(published_date);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_repo_trends_score ON repo_trends(last_date, score DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_star_rollups_date ON star_rollups(last_date);")
+
+        conn.commit()
+
+
+def get_or_create_repo(cursor, owner, name):
+    """Return the id of the repo row for owner/name, inserting it if needed."""
+    cursor.execute("SELECT id FROM repos WHERE owner = ? AND name = ?", (owner, name))
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute("INSERT INTO repos (owner, name) VALUES (?, ?)", (owner, name))
+    return cursor.lastrowid
+
+
+def link_papers_to_repos(conn):
+    """
+    Point every paper with a GitHub link at its canonical repo row.
+    Only papers that are not linked yet are looked at, so this is cheap on reruns.
+    Returns the ids of the papers that were linked.
+    """
+    # star_scraper pulls in pandas; import it here so the web app doesn't pay for it at startup.
+    from scripts.star_scraper import normalize_github_link
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, github_link FROM papers WHERE repo_id IS NULL AND github_link LIKE 'https://%'")
+    linked = []
+    for paper_id, github_link in cursor.fetchall():
+        repo = normalize_github_link(github_link)
+        if repo is None:
+            continue
+        repo_id = get_or_create_repo(cursor, *repo)
+        cursor.execute("UPDATE papers SET repo_id = ? WHERE id = ?", (repo_id, paper_id))
+        linked.append(paper_id)
+    conn.commit()
+    return linked
+
+
+def update_repo_identity(conn, repo_id, owner, name, node_id):
+    """
+    Store the canonical identity GitHub reported for a repo (after renames/redirects).
+    If another row already holds that identity, the two rows are merged: papers are
+    moved to the existing row and this one is deleted.
+    Returns the id of the surviving repo row.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id FROM repos WHERE id != ? AND ((owner = ? AND name = ?) OR node_id = ?)",
+        (repo_id, owner, name, node_id),
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        survivor_id = row[0]
+        cursor.execute("UPDATE papers SET repo_id = ? WHERE repo_id = ?", (survivor_id, repo_id))
+        cursor.execute("DELETE FROM repos WHERE id = ?", (repo_id,))
+        repo_id = survivor_id
+
+    cursor.execute(
+        "UPDATE repos SET owner = ?, name = ?, node_id = ? WHERE id = ?",
+        (owner, name, node_id, repo_id),
+    )
+    return repo_id
+
+
+def ranking_query(growth_days, sort_column, order_direction):
+    """
+    SQL for the ranking of one check date, with the star growth over the last growth_days and
+    the trend score (only known for the latest date). Bind the check date twice. Shared by the web app and the warm-start snapshot.
+    """
+    # Use aliases (e.g., p.title AS "Title") to match the case expected by the HTML template.
+    return f"""
+        SELECT
+            p.id AS paper_id,
+            p.title AS "Title",
+            p.pdf_link AS "Pdf_Link",
+            p.github_link AS "Github_Link",
+            p.arxiv_id AS "Arxiv_ID",
+            s1.stars AS current_stars,
+            (s1.stars - IFNULL(s2.stars, s1.stars)) AS growth,
+            t.score AS trend_score
+        FROM papers p
+        JOIN star_counts s1 ON p.id = s1.paper_id
+        LEFT JOIN repo_trends t ON t.repo_id = p.repo_id AND t.last_date = s1.check_date
+        LEFT JOIN star_counts s2 ON p.id = s2.paper_id AND s2.check_date = (
+            SELECT MAX(check_date)
+            FROM star_counts
+            WHERE paper_id = p.id AND check_date < DATE(?, '-{int(growth_days)} days')
+        )
+        WHERE s1.check_date = ?
+        ORDER BY {sort_column} {order_direction}, current_stars DESC
+    """
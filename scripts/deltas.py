@@ -0,0 +1,244 @@
+# deltas.py
+# The dataset lives in git as a base snapshot plus one small delta file per update run,
+# instead of the whole SQLite file being committed every day:
+#
+#   data/deltas/base-<time>.json.gz   every row, written by compaction
+#   data/deltas/<time>.json.gz        papers and repos that changed in one run, plus the star counts it recorded
+#                                     and the snapshots row (counts and fetch time) of each date it touched
+#
+# Files are gzipped JSON in columnar form ({"table": {"column": [values...]}}), which keeps
+# repeated values like the check date next to each other and compresses well without adding
+# a dependency. apply_deltas() brings a database up to date (it is cheap once applied) and
+# compact() folds all deltas into a new base.
+#
+#   python -m scripts.deltas apply                  # build/refresh data/arxiv.db
+#   python -m scripts.deltas compact                # write a new base, delete the folded deltas
+import os
+import gzip
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+from scripts.database import initialize_database
+from scripts.search import update_search_index
+from scripts.trends import update_trends
+from scripts.rollups import update_rollups
+from scripts.snapshots import update_snapshots, fill_times
+
+FORMAT_VERSION = 1
+DELTA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "deltas")
+# Tables carried in delta files, with the columns that identify a row. star_counts rows are
+# identified by (paper_id, check_date); their own id is local to each database. snapshots rows
+# are carried so their times stay those of the run that fetched the counts.
+TABLES = {"repos": ("id",), "papers": ("id",), "star_counts": ("paper_id", "check_date"), "snapshots": ("check_date",)}
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if not (table == "star_counts" and row[1] == "id")]
+
+
+def _to_columnar(columns, rows):
+    return {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+
+
+def _from_columnar(data):
+    columns = list(data)
+    return columns, list(zip(*(data[column] for column in columns)))
+
+
+def read_file(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(content, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def list_files(delta_dir=DELTA_DIR):
+    """Return (latest base file or None, delta files in the order they were written)."""
+    if not os.path.isdir(delta_dir):
+        return None, []
+    names = sorted(name for name in os.listdir(delta_dir) if name.endswith(".json.gz"))
+    bases = [name for name in names if name.startswith("base-")]
+    return (bases[-1] if bases else None), [name for name in names if not name.startswith("base-")]
+
+
+def state_before_run(conn):
+    """
+    Remember the current rows so write_delta() can tell what a run changed: a fingerprint of
+    every paper, repo and snapshot, and the highest star_counts id (new or replaced counts get
+    higher ids).
+    """
+    return {
+        "papers": {row[0]: hash(row) for row in conn.execute("SELECT * FROM papers")},
+        "repos": {row[0]: hash(row) for row in conn.execute("SELECT * FROM repos")},
+        "snapshots": {row[0]: hash(row) for row in conn.execute("SELECT * FROM snapshots")},
+        "star_counts_max_id": conn.execute("SELECT IFNULL(MAX(id), 0) FROM star_counts").fetchone()[0],
+    }
+
+
+def write_delta(db_path, before, delta_dir=DELTA_DIR, now=None):
+    """
+    Write the changes made since state_before_run() as a new delta file and mark it applied in
+    db_path. Returns the path of the file, or None if nothing changed.
+    """
+    now = now or datetime.now()
+    with sqlite3.connect(db_path) as conn:
+        _create_applied_table(conn)
+        tables, deleted = {}, {}
+        for table in ("repos", "papers", "snapshots"):
+            columns = _columns(conn, table)
+            changed = [row for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                       if before[table].get(row[0]) != hash(row)]
+            current_ids = {row[0] for row in conn.execute(f"SELECT {TABLES[table][0]} FROM {table}")}
+            tables[table] = _to_columnar(columns, changed)
+            deleted[table] = sorted(set(before[table]) - current_ids)
+        columns = _columns(conn, "star_counts")
+        star_rows = conn.execute(f"SELECT {', '.join(columns)} FROM star_counts WHERE id > ? ORDER BY id",
+                                 (before["star_counts_max_id"],)).fetchall()
+        tables["star_counts"] = _to_columnar(columns, star_rows)
+
+        if not any(len(next(iter(data.values()), [])) for data in tables.values()) and not any(deleted.values()):
+            return None
+        name = f"{now:%Y-%m-%dT%H%M%S}.json.gz"
+        _write_file(os.path.join(delta_dir, name), {
+            "format": FORMAT_VERSION, "created_at": now.isoformat(timespec="seconds"),
+            "tables": tables, "deleted": deleted,
+        })
+        conn.execute("INSERT OR REPLACE INTO applied_deltas (name, applied_at) VALUES (?, ?)",
+                     (name, now.isoformat(timespec="seconds")))
+        conn.commit()
+    return os.path.join(delta_dir, name)
+
+
+def _create_applied_table(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS applied_deltas (name TEXT PRIMARY KEY, applied_at TEXT)")
+
+
+def _apply_content(cursor, content):
+    for table, ids in content.get("deleted", {}).items():
+        cursor.executemany(f"DELETE FROM {table} WHERE {TABLES[table][0]} = ?", [(row_id,) for row_id in ids])
+    for table in TABLES:
+        data = content["tables"].get(table)
+        if not data:
+            continue
+        columns, rows = _from_columnar(data)
+        # REPLACE also removes rows that collide on another unique key, e.g. a repo merged
+        # into the row that now holds its owner/name.
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+
+
+def _note_dates(recorded, content, per_run=True):
+    """
+    Remember the check dates a file has star counts for, with a first/last fetch time for
+    dates that have no snapshots row (files written before those rows were carried). A per-run
+    delta was written right after its fetch, so its creation time is close; a base was written
+    whenever it was compacted, so its dates fall back to the check date itself (counts are
+    recorded under the day they were fetched).
+    """
+    for check_date in set(content["tables"].get("star_counts", {}).get("check_date", [])):
+        fetched_at = content.get("created_at") if per_run else check_date
+        first, last = recorded.get(check_date, (fetched_at, fetched_at))
+        recorded[check_date] = (min(first, fetched_at), max(last, fetched_at))
+
+
+def apply_deltas(db_path, delta_dir=DELTA_DIR):
+    """
+    Bring db_path up to date with the files in delta_dir: the base snapshot if this database
+    has not seen it yet, then every delta not applied so far, in order. Safe to call from
+    several processes at once. Returns the names of the files that were applied.
+    """
+    base, deltas = list_files(delta_dir)
+    if base is None and not deltas:
+        return []
+    initialize_database(db_path)
+    applied_now = []
+    with sqlite3.connect(db_path, timeout=60) as conn:
+        conn.execute("BEGIN IMMEDIATE") # one process applies, the others wait and then find nothing to do
+        _create_applied_table(conn)
+        applied = {row[0] for row in conn.execute("SELECT name FROM applied_deltas")}
+        cursor = conn.cursor()
+        stamp = datetime.now().isoformat(timespec="seconds")
+        recorded = {} # check date -> (first, last) creation time of the files with its counts
+        has_snapshots = conn.execute("SELECT 1 FROM snapshots LIMIT 1").fetchone() is not None
+        if base is not None and base not in applied:
+            content = read_file(os.path.join(delta_dir, base))
+            _apply_content(cursor, content)
+            _note_dates(recorded, content, per_run=False)
+            # Deltas folded into the base count as applied.
+            applied_now.append(base)
+            applied.update(content.get("includes", []))
+            cursor.executemany("INSERT OR IGNORE INTO applied_deltas (name, applied_at) VALUES (?, ?)",
+                               [(name, stamp) for name in content.get("includes", [])])
+        for name in deltas:
+            if name not in applied:
+                content = read_file(os.path.join(delta_dir, name))
+                _apply_content(cursor, content)
+                _note_dates(recorded, content)
+                applied_now.append(name)
+        cursor.executemany("INSERT OR REPLACE INTO applied_deltas (name, applied_at) VALUES (?, ?)",
+                           [(name, stamp) for name in applied_now])
+        # Derived data is not in the delta files; refresh it from the new rows (or build it
+        # if this database predates it).
+        if applied_now or not conn.execute("SELECT 1 FROM papers_fts LIMIT 1").fetchone():
+            update_search_index(conn)
+        if applied_now or not conn.execute("SELECT 1 FROM repo_trends LIMIT 1").fetchone():
+            update_trends(conn)
+        if applied_now or not conn.execute("SELECT 1 FROM star_rollups LIMIT 1").fetchone():
+            update_rollups(conn, recorded) # a delta may carry counts older than ones already rolled up
+        # snapshots rows come with the files, but recount the dates they touched (or every date
+        # if this database had none); times come from the files, never from now.
+        if applied_now or not has_snapshots:
+            update_snapshots(conn, (sorted(recorded) or None) if has_snapshots else None)
+            fill_times(conn, recorded)
+        conn.commit()
+    return applied_now
+
+
+def compact(db_path, delta_dir=DELTA_DIR, now=None):
+    """
+    Apply everything, then write all rows as a new base snapshot and delete the old base and
+    the deltas it now contains. Returns the path of the new base.
+    """
+    now = now or datetime.now()
+    apply_deltas(db_path, delta_dir)
+    old_base, deltas = list_files(delta_dir)
+    with sqlite3.connect(db_path) as conn:
+        _create_applied_table(conn)
+        includes = [row[0] for row in conn.execute("SELECT name FROM applied_deltas ORDER BY name")]
+        tables = {}
+        for table in TABLES:
+            columns = _columns(conn, table)
+            tables[table] = _to_columnar(columns, conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall())
+        name = f"base-{now:%Y-%m-%dT%H%M%S}.json.gz"
+        _write_file(os.path.join(delta_dir, name), {
+            "format": FORMAT_VERSION, "created_at": now.isoformat(timespec="seconds"),
+            "tables": tables, "includes": includes,
+        })
+        conn.execute("INSERT OR REPLACE INTO applied_deltas (name, applied_at) VALUES (?, ?)",
+                     (name, now.isoformat(timespec="seconds")))
+        conn.commit()
+    for folded in ([old_base] if old_base else []) + deltas:
+        os.remove(os.path.join(delta_dir, folded))
+    return os.path.join(delta_dir, name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["apply", "compact"])
+    parser.add_argument("--db", type=str, default=os.path.join(os.path.dirname(DELTA_DIR), "arxiv.db"))
+    parser.add_argument("--delta_dir", type=str, default=DELTA_DIR)
+    args = parser.parse_args()
+
+    if args.command == "apply":
+        applied = apply_deltas(args.db, args.delta_dir)
+        print(f"Applied {len(applied)} files to {args.db}.")
+    else:
+        print(f"Wrote {compact(args.db, args.delta_dir)}.")
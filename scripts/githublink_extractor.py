@@ -4,61 +4,134 @@ import csv
 import re
 import logging
 import pikepdf
+import os
 import time
 import xml.etree.ElementTree as ET
 from google import genai
 from google.genai import types
 from bs4 import BeautifulSoup
 from logging.handlers import RotatingFileHandler
-from pdfminer.high_level import extract_text
+from pdfminer.high_level import extract_text, extract_pages
+from pdfminer.layout import LTTextContainer
 from urllib.parse import urlparse
+from datetime import timedelta
+from scripts.star_scraper import normalize_github_link
+from scripts import metrics
+from scripts.llm_backend import is_transient, is_config_error, BackendConfigError
 
 # crawl_paper, obtain title and pdf link with url
 
-def pre_analyze(url, pdf_path="temp.pdf"):
-    """" Return True if the PDF contains a GitHub link, otherwise False. """
+URL_REGEX = r"https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*[a-zA-Z0-9/])"
+# A line that is only "References"/"Bibliography" (optionally numbered) starts the reference list.
+REFERENCES_HEADING = re.compile(r"^\s*(?:\d+\.?\s*)?(?:references|bibliography)\s*$", re.IGNORECASE | re.MULTILINE)
+SCAN_FIRST_PAGES = 3 # most papers put their code link in the abstract or a first-page footnote
 
-    # download the pdf
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(pdf_path, "wb") as f:
-            f.write(response.content)
-    else:
-        logging.info(f"pre_analyze1: {url}, Failed to download PDF: {response.status_code}")
-    
-    try:
-        # extract the clickable URLs
-        pdf_file = pikepdf.Pdf.open(pdf_path)
-        urls = []
+def has_github_url(urls):
+    return any("github" in str(url).lower() for url in urls)
+
+def annotation_urls(pdf_path):
+    """Return the URIs of the clickable links in the PDF (cheap: no text layout needed)."""
+    urls = []
+    with pikepdf.Pdf.open(pdf_path) as pdf_file:
         # iterate over PDF pages
         for page in pdf_file.pages:
             if page.get("/Annots") is not None:
                 for annots in page.get("/Annots"):
                     action = annots.get("/A")
-                    if action is not None:
-                        uri = action.get("/URI")
-                    else:
-                        uri = None 
+                    uri = action.get("/URI") if action is not None else None
                     if uri is not None:
-                        urls.append(uri)
-        
-        # extract the in-text URLs
-        url_regex = r"https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*[a-zA-Z0-9/])" # extract raw text from pdf
+                        urls.append(str(uri))
+    return urls
+
+def iter_page_texts(pdf_path):
+    """Yield the text of each page. Pages are only laid out when they are asked for."""
+    for page_layout in extract_pages(pdf_path):
+        yield "".join(element.get_text() for element in page_layout if isinstance(element, LTTextContainer)) + "\f"
+
+def scan_pdf(pdf_path, mode="tiered", first_pages=SCAN_FIRST_PAGES, timings=None):
+    """
+    Return (True, text) if the PDF contains a GitHub link, otherwise (False, None).
+
+    mode="tiered": read the link annotations, then the text of the first pages, and only
+    keep parsing the rest of the document when neither mentions GitHub. Text extraction
+    stops at the first "References" heading either way.
+    mode="full": the original behaviour, annotations plus the text of the whole document.
+
+    If `timings` is a dict, the seconds spent in each stage are added to it.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    urls = annotation_urls(pdf_path)
+    timings["annotations"] = time.perf_counter() - start
+
+    if mode == "full":
+        start = time.perf_counter()
         text = extract_text(pdf_path)
+        urls.extend(match.group() for match in re.finditer(URL_REGEX, text))
+        timings["full_text"] = time.perf_counter() - start
+        return (True, text) if has_github_url(urls) else (False, None)
 
-        # extract all urls using the regular expression
-        for match in re.finditer(url_regex, text):
-            url = match.group()
-            urls.append(url)
+    annotated_github = [url for url in urls if "github" in url.lower()]
+    pages = []
+    stage, start = "first_pages", time.perf_counter()
+    for page_number, page_text in enumerate(iter_page_texts(pdf_path), start=1):
+        heading = REFERENCES_HEADING.search(page_text)
+        if heading is not None:
+            pages.append(page_text[:heading.start()])
+            break
+        pages.append(page_text)
+        if page_number == first_pages:
+            timings[stage] = time.perf_counter() - start
+            if annotated_github or has_github_url(match.group() for match in re.finditer(URL_REGEX, "".join(pages))):
+                stage = None # first_pages is already recorded
+                break
+            stage, start = "full_text", time.perf_counter()
+    if stage is not None:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
 
-        if any("github" in str(url) for url in urls):
-            return True, text 
-        else:
-            return False, None
-        
+    text = "".join(pages)
+    text_urls = [match.group() for match in re.finditer(URL_REGEX, text)]
+    if not annotated_github and not has_github_url(text_urls):
+        return False, None
+    if annotated_github:
+        # the annotated link may sit on a page we did not read; hand it to the LLM as well
+        text += "\nLinks in the PDF: " + " ".join(annotated_github) + "\n"
+    return True, text
+
+def pre_analyze(url, pdf_path="temp.pdf", mode="tiered", timings=None):
+    """"
+    Return (True, text) if the PDF contains a GitHub link, otherwise (False, None).
+    Returns (None, error) if the PDF could not be downloaded or read, so the caller
+    can retry it later instead of caching a negative result.
+    """
+    timings = {} if timings is None else timings
+
+    # download the pdf
+    start = time.perf_counter()
+    try:
+        response = metrics.http_get(url)
+    except requests.exceptions.RequestException as e:
+        logging.info(f"pre_analyze1: {url}, Failed to download PDF: {e}")
+        return None, f"Failed to download PDF: {e}"
+    if response.status_code == 200:
+        with open(pdf_path, "wb") as f:
+            f.write(response.content)
+    else:
+        # don't fall through to a stale temp.pdf from the previous paper
+        logging.info(f"pre_analyze1: {url}, Failed to download PDF: {response.status_code}")
+        return None, f"Failed to download PDF: {response.status_code}"
+    timings["download"] = time.perf_counter() - start
+
+    try:
+        result = scan_pdf(pdf_path, mode=mode, timings=timings)
     except Exception as e:
         logging.info(f"pre_analyze2: {url}, Failed to extract URLs or PDF file: {e}")
-        return False, None
+        return None, f"Failed to extract URLs or PDF file: {e}"
+
+    for stage, seconds in timings.items():
+        metrics.observe("pdf_stage_seconds", seconds, stage=stage)
+    metrics.inc("pdf_scanned_total", with_github=result[0])
+    return result
 
 def analyze(text, prompt1, prompt2, api_key):
 
@@ -81,10 +154,11 @@ def analyze(text, prompt1, prompt2, api_key):
             if "503" in str(e):
                 logging.info(f"Analyze1: Attempt {attempt + 1}: Got 503 error, retrying in {delay} seconds...")
                 attempt += 1
-                time.sleep(delay)
+                metrics.sleep(delay, "gemini_503")
             else:
                 logging.info(f"Analyze2: Failed to analyze text: {e}")
                 return False, str(e)
+    return False, f"503: model still unavailable after {attempt} attempts"
 
 
 def analyze_response(response):
@@ -119,33 +193,131 @@ def write_csv(file_name, data, mode): #write data to cvs
         writer = csv.writer(file)
         writer.writerow(data)
 
-def extract_github(prompt1, prompt2, api_key, pdf_url = None): # find the github link from articles' author
-    if pdf_url is not None:
-        # check whether the pdf contain likns.
-        url_exist, text = pre_analyze(pdf_url)
+# --- Extraction status ---
+# Every paper records how its GitHub link extraction went, so reruns don't repeat the
+# expensive download + LLM path for papers whose answer is already known.
+STATUS_FOUND = "found"           # github_link holds the project link
+STATUS_NOT_FOUND = "not_found"   # the PDF has no GitHub link at all
+STATUS_AMBIGUOUS = "ambiguous"   # the model did not answer with exactly one link
+STATUS_RETRY = "retry"           # transient failure (429/5xx, timeout, download error), retried on schedule
+STATUS_FAILED = "failed"         # still failing after MAX_ATTEMPTS, or a permanent error (e.g. 400) for this paper alone
+TERMINAL_STATUSES = (STATUS_FOUND, STATUS_NOT_FOUND, STATUS_AMBIGUOUS, STATUS_FAILED)
 
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = timedelta(hours=6) # doubled after every failed attempt
 
-        if url_exist:
-            sucess, output= analyze(text, prompt1, prompt2, api_key)   # using AI to get author's github link
-            #extract the urls from AI's answer
-            if not sucess:
-                return output
-            else:
-                url_correct, urls = analyze_response(output)# NEED IMPROVEMENT FOR STRUCTURED OUTPUT
+def next_extraction_state(status, previous_attempts, now):
+    """
+    Return (status, attempts, next_retry_at) after an extraction attempt.
+    Transient failures back off exponentially and turn terminal after MAX_ATTEMPTS.
+    """
+    attempts = previous_attempts + 1
+    if status != STATUS_RETRY:
+        return status, attempts, None
+    if attempts >= MAX_ATTEMPTS:
+        return STATUS_FAILED, attempts, None
+    next_retry_at = now + RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return STATUS_RETRY, attempts, next_retry_at.isoformat(timespec="seconds")
 
+def extract_github_status(prompt1, prompt2, api_key, pdf_url): # find the github link from articles' author
+    """Return (status, github_link, error) for one paper."""
+    # check whether the pdf contain likns.
+    url_exist, text = pre_analyze(pdf_url)
+    if url_exist is None:
+        return STATUS_RETRY, None, text
+    if not url_exist:
+        return STATUS_NOT_FOUND, None, None
 
-            if url_correct: # make sure the AI give correct urls format
-                return urls
-            else: 
-                return "github link uncorrect"
-                # NEED IMPROVEMENT TO HANDLE WRONG MESSAGE FROM GEMINI
-                # print(urls)
-                # return urls
+    sucess, output = analyze(text, prompt1, prompt2, api_key)   # using AI to get author's github link
+    if not sucess:
+        return STATUS_RETRY, None, output
 
-        else:
-            return None
-    else:
+    #extract the urls from AI's answer
+    url_correct, urls = analyze_response(output)
+    if url_correct: # make sure the AI give correct urls format
+        return STATUS_FOUND, urls, None
+    return STATUS_AMBIGUOUS, None, urls
+
+MIN_CONFIDENCE = 0.5 # below this the model's answer is treated as ambiguous
+
+def extraction_from_result(result):
+    """Turn a backend's RepoExtraction (None if the model skipped the paper) into (status, github_link, error)."""
+    if result is None:
+        return STATUS_RETRY, None, "Paper missing from the model's answer"
+    if not result.repo_url:
+        return STATUS_NOT_FOUND, None, None
+    repo = normalize_github_link(result.repo_url)
+    if repo is None or result.confidence < MIN_CONFIDENCE:
+        return STATUS_AMBIGUOUS, None, f"{result.repo_url} (confidence {result.confidence}): {result.evidence}"
+    return STATUS_FOUND, "https://github.com/{}/{}".format(*repo), None
+
+def extract_github_batch(backend, contexts):
+    """
+    Run a backend over [(arxiv_id, reduced context)] in as few requests as it allows.
+    Returns {arxiv_id: (status, github_link, error)}.
+
+    Papers answered by the requests that went through keep their answers. For a failed
+    request, a transient error leaves its papers to retry. Any other error of a request with
+    several papers may come from just one of them, so each is sent again on its own; only a
+    paper that fails alone is marked failed. Raises BackendConfigError (with the outcomes
+    so far) when the backend itself is unusable (bad key, unknown model): that says nothing
+    about the papers, so the caller stops and leaves the rest as they were.
+    """
+    try:
+        results, failed = backend.extract(contexts)
+    except Exception as e:
+        results, failed = {}, {arxiv_id: e for arxiv_id, _ in contexts}
+    outcomes = {arxiv_id: extraction_from_result(results.get(arxiv_id)) for arxiv_id, _ in contexts if arxiv_id not in failed}
+    by_error = {} # failed request (its exception) -> its papers
+    for context in contexts:
+        if context[0] in failed:
+            by_error.setdefault(failed[context[0]], []).append(context)
+    for error, failed_contexts in by_error.items():
+        outcomes.update(_failed_request(backend, failed_contexts, error, "extract_github_batch", outcomes))
+    return outcomes
+
+def _failed_request(backend, contexts, error, caller, outcomes):
+    """Outcomes for the papers of a request that raised `error`, see extract_github_batch."""
+    logging.info(f"{caller}: Failed to analyze {len(contexts)} papers: {error}")
+    if is_config_error(error):
+        raise BackendConfigError(str(error), dict(outcomes)) from error
+    if is_transient(error):
+        return {arxiv_id: (STATUS_RETRY, None, str(error)) for arxiv_id, _ in contexts}
+    if len(contexts) == 1:
+        return {contexts[0][0]: (STATUS_FAILED, None, str(error))}
+    retried = {}
+    for context in contexts:
+        try:
+            retried.update(extract_github_batch(backend, [context]))
+        except BackendConfigError as e:
+            e.outcomes = {**outcomes, **retried, **e.outcomes}
+            raise
+    return retried
+
+def extract_github_batch_job(backend, contexts):
+    """
+    Same as extract_github_batch, but through the provider's batch mode; waits for the job to
+    finish. Errors are handled like extract_github_batch's (papers go one by one, directly).
+    """
+    try:
+        job_name, batches = backend.submit_batch_job(contexts)
+        results = backend.collect_batch_job(job_name, batches)
+    except Exception as e:
+        return _failed_request(backend, contexts, e, "extract_github_batch_job", {})
+    return {arxiv_id: extraction_from_result(results.get(arxiv_id)) for arxiv_id, _ in contexts}
+
+def extract_github(prompt1, prompt2, api_key, pdf_url = None): # find the github link from articles' author
+    if pdf_url is None:
         return None
+
+    status, github_link, error = extract_github_status(prompt1, prompt2, api_key, pdf_url)
+    if status == STATUS_FOUND:
+        return github_link
+    if status == STATUS_AMBIGUOUS:
+        return "github link uncorrect"
+    if status == STATUS_RETRY:
+        return error
+    return None
     
 import shutil
 import pandas as pd
@@ -0,0 +1,291 @@
+# llm_backend.py
+# Extraction backends that turn a paper's text into its GitHub repo with structured output.
+# GeminiBackend talks to the API; StubBackend is a deterministic offline stand-in with the
+# same interface, so throughput and accuracy can be measured without network access.
+import os
+import re
+import json
+import time
+import logging
+from typing import Optional
+
+import requests
+from pydantic import BaseModel
+
+from scripts import metrics
+
+try:
+    import httpx # the transport of google-genai
+    NETWORK_ERRORS = (TimeoutError, ConnectionError, requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                      httpx.TimeoutException, httpx.NetworkError)
+except ImportError:
+    NETWORK_ERRORS = (TimeoutError, ConnectionError, requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+GITHUB_URL_PATTERN = re.compile(r"(?:https?://)?(?:www\.)?github\.com/[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]*[A-Za-z0-9_-]", re.IGNORECASE)
+HEAD_CHARS = 2500   # title, authors, abstract and usually the first footnotes
+WINDOW_CHARS = 400  # context kept on each side of a "github" mention
+
+PROMPT = (
+    "You will get the text of one or more AI papers, each starting with a line 'PAPER <id>'. "
+    "For every paper, find the GitHub repository that contains the paper's own code or project. "
+    "Do not return repositories that are only cited or referenced. "
+    "Answer with one object per paper: paper_id, repo_url (null if the paper has no project repository), "
+    "confidence between 0 and 1, and evidence (the sentence the link appears in)."
+)
+
+
+class RepoExtraction(BaseModel):
+    paper_id: str
+    repo_url: Optional[str]
+    confidence: float
+    evidence: str
+
+
+def reduce_context(text):
+    """
+    Keep only the parts of a paper that matter for finding its repo: the head of the
+    paper plus a window around every GitHub mention. This is a fraction of the full
+    text, so several papers fit into one request.
+    """
+    if len(text) <= HEAD_CHARS:
+        return text
+    spans = [(0, HEAD_CHARS)]
+    for match in re.finditer("github", text, re.IGNORECASE):
+        start, end = max(0, match.start() - WINDOW_CHARS), match.end() + WINDOW_CHARS
+        if start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return "\n...\n".join(text[start:end] for start, end in spans)
+
+
+def pack_batches(papers, max_papers, max_chars):
+    """Group (paper_id, context) pairs into requests of at most max_papers / max_chars."""
+    batches, batch, size = [], [], 0
+    for paper_id, context in papers:
+        if batch and (len(batch) >= max_papers or size + len(context) > max_chars):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append((paper_id, context))
+        size += len(context)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class TransientError(Exception):
+    """A request that failed for now but may succeed later, e.g. a model that stayed unavailable."""
+
+
+class BackendConfigError(Exception):
+    """
+    The backend itself is unusable (bad or expired key, unknown model): no paper can succeed.
+    `outcomes` holds what was finished before the error, for the caller to keep.
+    """
+    def __init__(self, message, outcomes=None):
+        super().__init__(message)
+        self.outcomes = outcomes or {}
+
+
+CONFIG_ERROR_CODES = (401, 403, 404) # bad key, key without access, unknown model
+
+
+def is_config_error(error):
+    """Whether a failed request says the backend is misconfigured, rather than anything about the papers."""
+    return isinstance(error, BackendConfigError) or getattr(error, "code", None) in CONFIG_ERROR_CODES
+
+
+def is_transient(error):
+    """
+    Whether a failed request is worth retrying later: HTTP 429 and 5xx (google-genai's APIError
+    carries the status in `code`), timeouts and dropped connections. Anything else, such as
+    400 (invalid request), fails the same way every time.
+    """
+    if isinstance(error, TransientError):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return isinstance(error, NETWORK_ERRORS)
+
+
+def build_contents(batch):
+    return PROMPT + "\n\n" + "\n\n".join(f"PAPER {paper_id}\n{context}" for paper_id, context in batch)
+
+
+def parse_results(batch, items):
+    """Map the model's answer back to the papers of the batch; papers it skipped get None."""
+    results = {paper_id: None for paper_id, _ in batch}
+    for item in items:
+        if isinstance(item, dict):
+            item = RepoExtraction(**item)
+        if item.paper_id in results:
+            results[item.paper_id] = item
+    return results
+
+
+class GeminiBackend:
+    """
+    Gemini with a JSON schema response. One client is created and reused for every
+    request, and several papers are packed into each request.
+    """
+
+    def __init__(self, api_key, model=None, max_papers=20, max_chars=200_000):
+        if not api_key:
+            raise BackendConfigError("GEMINI_API_KEY is not set")
+        from google import genai
+        from google.genai import types
+        self.client = genai.Client(api_key=api_key)
+        self.model = model or os.getenv("GOOGLE_MODEL")
+        self.max_papers = max_papers
+        self.max_chars = max_chars # well below the model's input limit, keeps the answer short
+        self.config = types.GenerateContentConfig(
+            temperature=0,
+            top_p=0.3,
+            top_k=40,
+            response_mime_type="application/json",
+            response_schema=list[RepoExtraction],
+        )
+
+    def _generate(self, batch):
+        attempt = 0
+        delay = 5
+        while attempt < 5:
+            try:
+                with metrics.timer("llm_request_seconds", backend="gemini"):
+                    response = self.client.models.generate_content(
+                        model=self.model, contents=build_contents(batch), config=self.config)
+                usage = response.usage_metadata
+                if usage is not None:
+                    metrics.inc("llm_tokens_total", usage.prompt_token_count or 0, kind="prompt")
+                    metrics.inc("llm_tokens_total", usage.candidates_token_count or 0, kind="output")
+                metrics.inc("llm_papers_total", len(batch), backend="gemini")
+                return response
+            except Exception as e:
+                if "503" not in str(e):
+                    raise
+                logging.info(f"GeminiBackend: Attempt {attempt + 1}: Got 503 error, retrying in {delay} seconds...")
+                attempt += 1
+                metrics.sleep(delay, "gemini_503")
+                delay *= 2
+        raise TransientError(f"503: model still unavailable after {attempt} attempts")
+
+    def extract(self, papers):
+        """
+        Find the repo of each (paper_id, context) pair. Returns ({paper_id: RepoExtraction or
+        None}, {paper_id: exception} for the papers whose request failed). A failed request
+        doesn't lose the answers of the others; after a key/model error the remaining requests
+        are not sent, their papers get the same error.
+        """
+        results, failed, config_error = {}, {}, None
+        for batch in pack_batches(papers, self.max_papers, self.max_chars):
+            if config_error is not None:
+                failed.update((paper_id, config_error) for paper_id, _ in batch)
+                continue
+            try:
+                response = self._generate(batch)
+                items = response.parsed if response.parsed is not None else json.loads(response.text)
+                results.update(parse_results(batch, items))
+            except Exception as e:
+                logging.info(f"GeminiBackend: request for {len(batch)} papers failed: {e}")
+                failed.update((paper_id, e) for paper_id, _ in batch)
+                config_error = e if is_config_error(e) else None
+        return results, failed
+
+    def submit_batch_job(self, papers, display_name="githubstars-backfill"):
+        """
+        Submit papers through the Batch API (half the price, answered within 24h) for large
+        backfills. Returns the job name and the packed batches, both needed by collect_batch_job.
+        """
+        batches = pack_batches(papers, self.max_papers, self.max_chars)
+        inline_requests = [
+            {"contents": [{"parts": [{"text": build_contents(batch)}], "role": "user"}],
+             "config": {"response_mime_type": "application/json",
+                        "response_schema": list[RepoExtraction],
+                        "temperature": 0}}
+            for batch in batches
+        ]
+        job = self.client.batches.create(model=self.model, src=inline_requests, config={"display_name": display_name})
+        logging.info(f"GeminiBackend: submitted batch job {job.name} with {len(inline_requests)} requests")
+        return job.name, batches
+
+    def collect_batch_job(self, job_name, batches, poll_interval=60):
+        """Wait for a batch job and return {paper_id: RepoExtraction or None}."""
+        done_states = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+        job = self.client.batches.get(name=job_name)
+        while job.state.name not in done_states:
+            time.sleep(poll_interval)
+            job = self.client.batches.get(name=job_name)
+        if job.state.name == "JOB_STATE_EXPIRED": # not run in time; submitting again may work
+            raise TransientError(f"Batch job {job_name} ended in {job.state.name}: {job.error}")
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch job {job_name} ended in {job.state.name}: {job.error}")
+
+        results = {}
+        for batch, inlined in zip(batches, job.dest.inlined_responses):
+            if inlined.error is not None or inlined.response is None:
+                logging.info(f"GeminiBackend: batch request failed: {inlined.error}")
+                continue
+            results.update(parse_results(batch, json.loads(inlined.response.text)))
+        return results
+
+
+class StubBackend:
+    """
+    Offline stand-in for GeminiBackend: picks the first GitHub link in the reduced
+    context. Optionally sleeps per request to mimic API latency.
+    """
+
+    def __init__(self, max_papers=20, max_chars=200_000, latency=0.0):
+        self.max_papers = max_papers
+        self.max_chars = max_chars
+        self.latency = latency
+
+    def extract(self, papers):
+        results = {}
+        for batch in pack_batches(papers, self.max_papers, self.max_chars):
+            with metrics.timer("llm_request_seconds", backend="stub"):
+                time.sleep(self.latency)
+            metrics.inc("llm_papers_total", len(batch), backend="stub")
+            items = []
+            for paper_id, context in batch:
+                match = GITHUB_URL_PATTERN.search(context)
+                if match is None:
+                    items.append(RepoExtraction(paper_id=paper_id, repo_url=None, confidence=1.0, evidence=""))
+                    continue
+                url = match.group()
+                if not url.lower().startswith("http"):
+                    url = "https://" + url
+                line_start = context.rfind("\n", 0, match.start()) + 1
+                line_end = context.find("\n", match.end())
+                evidence = context[line_start:line_end if line_end != -1 else None]
+                items.append(RepoExtraction(paper_id=paper_id, repo_url=url, confidence=0.5, evidence=evidence))
+            results.update(parse_results(batch, items))
+        return results, {}
+
+
+def evaluate_backend(backend, samples):
+    """
+    Measure a backend on labelled samples: a list of (paper_id, context, expected_url),
+    expected_url being None for papers without a repo.
+    Returns throughput (papers/s) and accuracy.
+    """
+    from scripts.star_scraper import normalize_github_link
+
+    start = time.perf_counter()
+    results, _ = backend.extract([(paper_id, context) for paper_id, context, _ in samples])
+    elapsed = time.perf_counter() - start
+
+    correct = 0
+    for paper_id, _, expected in samples:
+        result = results.get(paper_id)
+        found = normalize_github_link(result.repo_url) if result and result.repo_url else None
+        expected = normalize_github_link(expected) if expected else None
+        if (found and expected and tuple(map(str.lower, found)) == tuple(map(str.lower, expected))) or found == expected:
+            correct += 1
+    return {
+        "papers": len(samples),
+        "seconds": elapsed,
+        "papers_per_second": len(samples) / elapsed if elapsed else None,
+        "accuracy": correct / len(samples) if samples else None,
+    }
@@ -0,0 +1,186 @@
+# metrics.py
+# In-process counters, gauges and histograms for the update pipeline and the web app.
+# A run ends with write_json_report() (machine-readable run report) and, optionally,
+# write_prometheus() (a textfile for node_exporter's textfile collector).
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Histogram bucket upper bounds, in seconds for timings.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_gauges = {}      # (name, labels) -> value
+_histograms = {}  # (name, labels) -> {"count", "sum", "min", "max", "buckets"}
+_started_at = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add `value` to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record one observation (usually a duration in seconds) in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"count": 0, "sum": 0.0, "min": value, "max": value,
+                                            "buckets": [0] * len(BUCKETS)}
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["min"] = min(histogram["min"], value)
+        histogram["max"] = max(histogram["max"], value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+                break
+
+
+@contextmanager
+def timer(name, **labels):
+    """Time the body of a with-block into the histogram `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def sleep(seconds, reason):
+    """time.sleep that is accounted for as a rate-limit / backoff wait."""
+    observe("rate_limit_wait_seconds", seconds, reason=reason)
+    time.sleep(seconds)
+
+
+def _record_http(method, url, start, response):
+    host = urlparse(url).netloc
+    observe("http_request_seconds", time.perf_counter() - start, host=host, method=method)
+    inc("http_requests_total", host=host, status=response.status_code)
+    inc("http_bytes_total", len(response.content), host=host)
+
+
+def http_get(url, **kwargs):
+    """requests.get that records latency, status and downloaded bytes per host."""
+    import requests # only the pipeline makes HTTP calls; keep it out of the web app's imports
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.exceptions.RequestException:
+        inc("http_errors_total", host=urlparse(url).netloc)
+        raise
+    _record_http("GET", url, start, response)
+    return response
+
+
+def http_post(url, **kwargs):
+    """requests.post counterpart of http_get."""
+    import requests
+    start = time.perf_counter()
+    try:
+        response = requests.post(url, **kwargs)
+    except requests.exceptions.RequestException:
+        inc("http_errors_total", host=urlparse(url).netloc)
+        raise
+    _record_http("POST", url, start, response)
+    return response
+
+
+def reset():
+    """Forget everything recorded so far."""
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _started_at = time.time()
+
+
+def snapshot():
+    """Return everything recorded so far as plain, JSON-serialisable data."""
+    def rows(metrics, value_of):
+        return [{"name": name, "labels": dict(labels), **value_of(value)}
+                for (name, labels), value in sorted(metrics.items())]
+
+    def histogram_value(histogram):
+        return {"count": histogram["count"], "sum": histogram["sum"], "min": histogram["min"],
+                "max": histogram["max"], "mean": histogram["sum"] / histogram["count"],
+                "buckets": dict(zip([str(bound) for bound in BUCKETS], histogram["buckets"]))}
+
+    with _lock:
+        return {
+            "started_at": _started_at,
+            "duration_seconds": time.time() - _started_at,
+            "counters": rows(_counters, lambda value: {"value": value}),
+            "gauges": rows(_gauges, lambda value: {"value": value}),
+            "histograms": rows(_histograms, histogram_value),
+        }
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path) # readers never see a half-written file
+
+
+def write_json_report(path, **extra):
+    """Write the run report (all metrics plus any extra fields) as JSON."""
+    report = snapshot()
+    report.update(extra)
+    _write_atomic(path, json.dumps(report, indent=2))
+    return report
+
+
+def prometheus_text(prefix="githubstars_"):
+    """Render all metrics in the Prometheus text exposition format."""
+    def labels_text(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    lines, typed = [], set()
+    with _lock:
+        for kind, metrics in (("counter", _counters), ("gauge", _gauges)):
+            for (name, labels), value in sorted(metrics.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}{name} {kind}")
+                    typed.add(name)
+                lines.append(f"{prefix}{name}{labels_text(labels)} {value}")
+        for (name, labels), histogram in sorted(_histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                cumulative += count
+                lines.append(f"{prefix}{name}_bucket{labels_text(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{prefix}{name}_bucket{labels_text(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{prefix}{name}_sum{labels_text(labels)} {histogram['sum']}")
+            lines.append(f"{prefix}{name}_count{labels_text(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Write the metrics as a Prometheus textfile."""
+    _write_atomic(path, prometheus_text())
@@ -0,0 +1,54 @@
+# query_log.py
+# Slow-query log for the web app. A connection opened with factory=RecordingConnection
+# remembers the statements it runs (SQL and parameters) while `statements` is a list; when a
+# timed block of the app takes longer than its threshold, log_slow() writes one JSON line per
+# block with every statement and its EXPLAIN QUERY PLAN to the "slow_queries" logger.
+import json
+import logging
+import sqlite3
+
+logger = logging.getLogger("slow_queries")
+
+
+class RecordingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        if self.connection.statements is not None:
+            self.connection.statements.append((sql, parameters))
+        return super().execute(sql, parameters)
+
+
+class RecordingConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = None # a list while recording
+
+    def cursor(self, factory=RecordingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+def explain(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN of a statement as indented lines, like the sqlite3 shell prints it."""
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    depth, lines = {0: -1}, []
+    for node_id, parent, _, detail in (tuple(row) for row in rows):
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def log_slow(conn, name, seconds, statements, **context):
+    """Log a block that ran longer than the threshold, with the plan of each statement it ran."""
+    logger.warning(json.dumps({
+        "query": name,
+        "ms": round(seconds * 1000, 2),
+        **context,
+        "statements": [{"sql": " ".join(sql.split()), "parameters": list(parameters) if not isinstance(parameters, dict) else parameters,
+                        "plan": explain(conn, sql, parameters)}
+                       for sql, parameters in statements],
+    }, default=str))
@@ -0,0 +1,91 @@
+# rollups.py
+# Downsampled star histories for charts. The daily series is star_counts itself (its
+# (paper_id, check_date) index makes one paper's range a short index scan); weekly and monthly
+# series are kept in star_rollups, one row per paper and bucket holding the last count seen in
+# that bucket. update_rollups() only folds check dates it hasn't seen yet, plus the dates it is
+# told were written late.
+
+# Bucket start for each rolled-up period (SQLite date modifiers): weeks start on Monday.
+PERIODS = {
+    "week": "DATE({column}, '-6 days', 'weekday 1')",
+    "month": "DATE({column}, 'start of month')",
+}
+# Longest window served from each series; longer windows use the next coarser one.
+MAX_DAYS = {"day": 92, "week": 730}
+
+
+def update_rollups(conn, check_dates=()):
+    """
+    Fold star counts into the weekly and monthly buckets. Check dates from the latest one
+    already rolled up onwards are read (that date again, in case it was re-fetched), plus
+    `check_dates`: dates written after later ones were rolled up, e.g. by deltas applied out of
+    order. A bucket only takes a count at least as recent as the one it holds, so folding a
+    date again is harmless. Returns the number of bucket rows written.
+    """
+    cursor = conn.cursor()
+    since = cursor.execute("SELECT IFNULL(MAX(last_date), '') FROM star_rollups").fetchone()[0]
+    # One statement per range, so each is a range scan of the date index.
+    ranges = [("check_date >= ?", since)] + [("check_date = ?", day) for day in sorted(set(check_dates)) if day < since]
+    folded = 0
+    for period, bucket in PERIODS.items():
+        for condition, value in ranges:
+            cursor.execute(f'''
+                INSERT INTO star_rollups (paper_id, period, bucket, stars, last_date)
+                SELECT paper_id, ?, {bucket.format(column="check_date")}, stars, check_date
+                FROM star_counts WHERE {condition}
+                ORDER BY check_date
+                ON CONFLICT (paper_id, period, bucket) DO UPDATE SET
+                    stars = excluded.stars,
+                    last_date = excluded.last_date
+                WHERE excluded.last_date >= star_rollups.last_date
+            ''', (period, value))
+            folded += cursor.rowcount
+    conn.commit()
+    return folded
+
+
+def period_for(days):
+    """The series to read for a window of `days`."""
+    if days <= MAX_DAYS["day"]:
+        return "day"
+    return "week" if days <= MAX_DAYS["week"] else "month"
+
+
+def series(conn, paper_ids, end_date, days):
+    """
+    Star history of several papers over the `days` before end_date, in one query.
+    Returns {paper_id: [(date, stars), ...]} in date order.
+    """
+    paper_ids = list(paper_ids)
+    if not paper_ids:
+        return {}
+    period = period_for(days)
+    placeholders = ", ".join("?" * len(paper_ids))
+    if period == "day":
+        query = f'''
+            SELECT paper_id, check_date, stars FROM star_counts
+            WHERE paper_id IN ({placeholders}) AND check_date > DATE(?, ?) AND check_date <= ?
+            ORDER BY paper_id, check_date
+        '''
+        params = (*paper_ids, end_date, f"-{int(days)} days", end_date)
+    else:
+        query = f'''
+            SELECT paper_id, bucket, stars FROM star_rollups
+            WHERE paper_id IN ({placeholders}) AND period = ? AND bucket > DATE(?, ?) AND bucket <= ?
+            ORDER BY paper_id, bucket
+        '''
+        params = (*paper_ids, period, end_date, f"-{int(days)} days", end_date)
+    result = {paper_id: [] for paper_id in paper_ids}
+    for paper_id, bucket, stars in conn.execute(query, params):
+        result[paper_id].append((bucket, stars))
+    return result
+
+
+def sparkline_points(values, width=100, height=24):
+    """SVG polyline points ("x,y x,y ...") for a list of numbers, scaled to width x height."""
+    if len(values) < 2:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    return " ".join(f"{i * step:.1f},{height - (value - low) / span * height:.1f}" for i, value in enumerate(values))
@@ -0,0 +1,121 @@
+# search.py
+# Full-text search over paper titles, abstracts and repo names (SQLite FTS5), with filters,
+# ranking and pagination done in one query.
+import re
+
+# What a paper's repo looks like in the index: "owner/name" (the tokenizer splits it into words).
+REPO_TEXT = "IFNULL(r.owner || '/' || r.name, '')"
+# bm25 column weights: a match in the title or repo name counts more than one in the abstract.
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+SORTS = {
+    "relevance": "m.rank, s1.stars DESC",
+    "stars": "s1.stars DESC",
+    "growth": "(s1.stars - IFNULL(s2.stars, s1.stars)) DESC, s1.stars DESC",
+    "published": "p.published_date DESC",
+}
+
+
+def update_search_index(conn):
+    """
+    Bring papers_fts in line with papers/repos: (re)index papers that are new or whose title,
+    abstract or repo changed, and drop papers that no longer exist. Unchanged papers are only
+    compared, not re-tokenized. Returns the number of papers indexed.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT p.id, p.title, p.abstract, {REPO_TEXT}
+        FROM papers p
+        LEFT JOIN repos r ON r.id = p.repo_id
+        LEFT JOIN papers_fts f ON f.rowid = p.id
+        WHERE f.rowid IS NULL OR f.title IS NOT p.title OR f.abstract IS NOT p.abstract OR f.repo IS NOT {REPO_TEXT}
+    ''')
+    changed = cursor.fetchall()
+    cursor.executemany("DELETE FROM papers_fts WHERE rowid = ?", [(row[0],) for row in changed])
+    cursor.executemany("INSERT INTO papers_fts (rowid, title, abstract, repo) VALUES (?, ?, ?, ?)", changed)
+    cursor.execute("DELETE FROM papers_fts WHERE rowid NOT IN (SELECT id FROM papers)")
+    conn.commit()
+    return len(changed)
+
+
+def fts_query(text):
+    """
+    Turn free text typed by a user into an FTS5 query: every word must match, as a prefix
+    ("graph transf" finds "graph transformers"). Returns None if there is nothing to search for.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def search(conn, text=None, check_date=None, growth_days=1, min_stars=None, published_from=None,
+           published_to=None, category=None, sort="relevance", page=1, per_page=50):
+    """
+    Search papers and return (rows, total_items) for one page. Stars and growth are those of
+    check_date (papers without a count that day are still found unless min_stars is given).
+    published_from/published_to are inclusive yyyy-mm-dd dates, category an arXiv category
+    such as "cs.LG" (primary or cross-list).
+    """
+    match = fts_query(text)
+    params = {"date": check_date, "match": match, "min_stars": min_stars, "published_from": published_from,
+              "published_to": published_to, "category": f"% {category} %", "limit": per_page,
+              "offset": (page - 1) * per_page}
+    if match:
+        # Run the full-text match once and drive the join from its results: left to itself the
+        # planner may start from star_counts and repeat the MATCH for every row.
+        matches = f'''
+            WITH m AS MATERIALIZED (
+                SELECT rowid AS paper_id, bm25(papers_fts, {", ".join(map(str, BM25_WEIGHTS))}) AS rank
+                FROM papers_fts WHERE papers_fts MATCH :match
+            )'''
+        source = "m CROSS JOIN papers p ON p.id = m.paper_id"
+    else:
+        matches, source = "", "papers p"
+        sort = "stars" if sort == "relevance" else sort
+
+    filters = []
+    if min_stars is not None:
+        filters.append("s1.stars >= :min_stars")
+    if published_from:
+        filters.append("p.published_date >= :published_from")
+    if published_to:
+        filters.append("p.published_date < DATE(:published_to, '+1 day')")
+    if category:
+        filters.append("(' ' || p.categories || ' ') LIKE :category")
+
+    growth_join = f'''
+        LEFT JOIN star_counts s2 ON s2.paper_id = p.id AND s2.check_date = (
+            SELECT MAX(check_date)
+            FROM star_counts
+            WHERE paper_id = p.id AND check_date < DATE(:date, '-{int(growth_days)} days')
+        )'''
+    # Filter, rank and cut the page with as little per-row work as possible; the growth lookup
+    # is only done for every match when the results are sorted by it.
+    query = f'''{matches}
+        SELECT
+            p.title AS "Title",
+            p.pdf_link AS "Pdf_Link",
+            p.github_link AS "Github_Link",
+            p.arxiv_id AS "Arxiv_ID",
+            p.published_date AS "Published",
+            p.categories AS "Categories",
+            s1.stars AS current_stars,
+            (s1.stars - IFNULL(s2.stars, s1.stars)) AS growth,
+            page.total_items
+        FROM (
+            SELECT
+                p.id AS paper_id,
+                ROW_NUMBER() OVER (ORDER BY {SORTS.get(sort, SORTS["stars"])}, p.id DESC) AS position,
+                COUNT(*) OVER () AS total_items
+            FROM {source}
+            LEFT JOIN star_counts s1 ON s1.paper_id = p.id AND s1.check_date = :date
+            {growth_join if sort == "growth" else ""}
+            {"WHERE " + " AND ".join(filters) if filters else ""}
+            ORDER BY position
+            LIMIT :limit OFFSET :offset
+        ) page
+        JOIN papers p ON p.id = page.paper_id
+        LEFT JOIN star_counts s1 ON s1.paper_id = p.id AND s1.check_date = :date
+        {growth_join}
+        ORDER BY page.position
+    '''
+    rows = conn.execute(query, params).fetchall()
+    return rows, (rows[0][-1] if rows else 0)
@@ -0,0 +1,90 @@
+# snapshots.py
+# One row per check date in the snapshots table: how many star counts and repos were recorded
+# for it, and when the row was first and last written. The viewer takes its date list, its
+# previous/next day links, its "no data" check and its freshness indicator from this small
+# table (primary key lookups) instead of scanning star_counts on every page view.
+#
+# The times are those of the star refresh, not of whoever rebuilds the table: only
+# update_star_counts passes `now`. The rows travel in the dataset deltas, and applying deltas
+# only recounts them (see deltas.apply_deltas).
+
+
+def update_snapshots(conn, check_dates=None, now=None):
+    """
+    Recount the given check dates, or by default every date from the latest one already in
+    the table onwards (so an empty table is backfilled). With `now` (the time the counts were
+    fetched) the rows are stamped with it; without, they keep their times and new rows get
+    none. Rows of dates that no longer have star counts are removed. Returns the number of
+    dates written.
+    """
+    cursor = conn.cursor()
+    if check_dates is None:
+        since = cursor.execute("SELECT IFNULL(MAX(check_date), '') FROM snapshots").fetchone()[0]
+        where, params = "s.check_date >= ?", [since]
+    else:
+        where, params = f"s.check_date IN ({', '.join('?' * len(check_dates))})", list(check_dates)
+    cursor.execute(f'''
+        INSERT INTO snapshots (check_date, row_count, repo_count, created_at, updated_at)
+        SELECT s.check_date, COUNT(*), COUNT(DISTINCT p.repo_id), ?, ?
+        FROM star_counts s LEFT JOIN papers p ON p.id = s.paper_id
+        WHERE {where}
+        GROUP BY s.check_date
+        ON CONFLICT (check_date) DO UPDATE SET
+            row_count = excluded.row_count,
+            repo_count = excluded.repo_count,
+            created_at = IFNULL(snapshots.created_at, excluded.created_at),
+            updated_at = IFNULL(excluded.updated_at, snapshots.updated_at)
+    ''', [now, now] + params)
+    written = cursor.rowcount
+    cursor.execute('''
+        DELETE FROM snapshots
+        WHERE NOT EXISTS (SELECT 1 FROM star_counts s WHERE s.check_date = snapshots.check_date)
+    ''')
+    conn.commit()
+    return written
+
+
+def dates_of_papers(conn, paper_ids):
+    """Check dates with star counts for any of paper_ids, e.g. papers that just got a repo_id."""
+    paper_ids, dates = list(paper_ids), set()
+    for i in range(0, len(paper_ids), 500):
+        chunk = paper_ids[i:i + 500]
+        dates.update(row[0] for row in conn.execute(
+            f"SELECT DISTINCT check_date FROM star_counts WHERE paper_id IN ({', '.join('?' * len(chunk))})", chunk))
+    return sorted(dates)
+
+
+def fill_times(conn, recorded):
+    """
+    Give rows without times the ones in `recorded` ({check_date: (created_at, updated_at)}),
+    e.g. the creation times of the delta files their star counts came from.
+    """
+    conn.executemany('''
+        UPDATE snapshots SET created_at = IFNULL(created_at, ?), updated_at = IFNULL(updated_at, ?)
+        WHERE check_date = ?
+    ''', [(created_at, updated_at, check_date) for check_date, (created_at, updated_at) in recorded.items()])
+    conn.commit()
+
+
+def available_dates(conn):
+    """Check dates with star counts, newest first."""
+    return [row[0] for row in conn.execute("SELECT check_date FROM snapshots ORDER BY check_date DESC")]
+
+
+def latest(conn):
+    """The newest snapshot row, or None if nothing has been recorded."""
+    return conn.execute("SELECT * FROM snapshots ORDER BY check_date DESC LIMIT 1").fetchone()
+
+
+def navigation(conn, check_date):
+    """
+    (snapshot row of check_date or None, previous date, next date, updated_at of the newest
+    date), each a primary key lookup.
+    """
+    snapshot = conn.execute("SELECT * FROM snapshots WHERE check_date = ?", (check_date,)).fetchone()
+    prev_date, next_date, last_updated = conn.execute('''
+        SELECT (SELECT MAX(check_date) FROM snapshots WHERE check_date < ?),
+               (SELECT MIN(check_date) FROM snapshots WHERE check_date > ?),
+               (SELECT updated_at FROM snapshots ORDER BY check_date DESC LIMIT 1)
+    ''', (check_date, check_date)).fetchone()
+    return snapshot, prev_date, next_date, last_updated
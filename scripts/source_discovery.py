@@ -0,0 +1,135 @@
+# source_discovery.py
+# Find a paper's GitHub repo from its arXiv metadata (abstract, comment, links) and,
+# optionally, its LaTeX source, before falling back to downloading and parsing the PDF.
+import io
+import re
+import gzip
+import logging
+import tarfile
+
+import requests
+
+from scripts.star_scraper import normalize_github_link
+from scripts import metrics
+
+EPRINT_URL = "https://arxiv.org/e-print/{arxiv_id}"
+GITHUB_PATTERN = re.compile(r"(?:https?://)?(?:www\.)?github\.com/[^\s{}()<>\"'\\]+", re.IGNORECASE)
+LATEX_LINK_PATTERN = re.compile(r"\\(?:url|href)\s*\{([^}]*)\}")
+# Everything after these is the bibliography, where links are citations of other work.
+BIBLIOGRAPHY_PATTERN = re.compile(r"\\begin\{thebibliography\}|\\bibliography\{|\\printbibliography")
+# A repo named in the abstract, comment or LaTeX source only counts as the paper's own when the
+# sentence introduces it that way ("Our code is available at ...", "Code: ..."), and nothing
+# after that cue says the link is someone else's work ("... builds on ...). "Available at" alone
+# is not enough: it needs the paper's artifacts as subject, either with "our"/"the" or opening
+# the sentence ("Code and models are available at ..."), not "LLaMA (available at ...)".
+OWNERSHIP_PATTERN = re.compile(
+    r"\b(?:our|source)\s+(?:code|implementation|project|repository|repo)\b"
+    r"|\b(?:code|project page|project|repository|repo|implementation)\s*:"
+    r"|(?:^\s*|\b(?:our|the|all)\s+)(?:source\s+)?(?:code|implementations?|models?|data(?:sets?)?|weights|checkpoints|"
+    r"project(?:\s+page)?|repository|repo)(?:\s*(?:,|and|&)\s*(?:the\s+)?\w+)*\s+"
+    r"(?:(?:is|are|will\s+be|has\s+been|have\s+been)\s+)?(?:publicly\s+|freely\s+|now\s+|also\s+)?"
+    r"(?:available|released|open[- ]sourced?|hosted)\s+(?:at|on|in|from|via)\b"
+    r"|\bwe\s+(?:release|open[- ]source|make\b[^.]{0,40}\bavailable|provide)\b", re.IGNORECASE)
+CITATION_PATTERN = re.compile(
+    r"\b(?:based on|builds? (?:up)?on|built (?:up)?on|extends?|adapted from|borrowed from|forked from|"
+    r"follows?|we use|uses)\b", re.IGNORECASE)
+OWNERSHIP_WINDOW = 160 # characters before a link searched for a cue
+
+
+def unique_repo(candidates):
+    """Return the canonical URL if the candidates point at exactly one repo, otherwise None."""
+    repos = {}
+    for candidate in candidates:
+        repo = normalize_github_link(candidate)
+        if repo is not None:
+            repos.setdefault((repo[0].lower(), repo[1].lower()), repo)
+    if len(repos) != 1:
+        return None
+    owner, name = next(iter(repos.values()))
+    return f"https://github.com/{owner}/{name}"
+
+
+def owned_links(text, pattern):
+    """
+    The links matched by `pattern` (its first group if it has one) that text presents as the
+    paper's own: an ownership cue earlier in the same sentence and no citation cue after it.
+    """
+    links = []
+    for match in pattern.finditer(text):
+        before = text[max(0, match.start() - OWNERSHIP_WINDOW):match.start()]
+        before = re.split(r"(?<=[.!?;])\s+|\n\s*\n", before)[-1] # same sentence
+        cues = list(OWNERSHIP_PATTERN.finditer(before))
+        if cues and not CITATION_PATTERN.search(before[cues[-1].end():]):
+            links.append(match.group(1) if pattern.groups else match.group())
+    return links
+
+
+def own_repo(text, pattern):
+    """
+    The canonical URL if the links in text point at exactly one repo and the text presents it
+    as the paper's own. A repo that is merely mentioned ("we build on github.com/x/y") may be
+    cited work; that is left to the PDF + LLM path.
+    """
+    links = [link for link in (match.group(1) if pattern.groups else match.group() for match in pattern.finditer(text))
+             if "github" in link.lower()]
+    github_link = unique_repo(links)
+    if github_link is None or unique_repo(owned_links(text, pattern)) != github_link:
+        return None
+    return github_link
+
+
+def find_repo_in_metadata(abstract, comment, links):
+    """Look for a single GitHub repo, introduced as the paper's own, in the fields of the arXiv Atom entry."""
+    # Fields are kept apart so a sentence never runs from one into the next.
+    text = "\n\n".join(field for field in (abstract, comment, links) if field)
+    return own_repo(text, GITHUB_PATTERN)
+
+
+def latex_sources(content):
+    """Yield the .tex files of an arXiv e-print (a gzipped tarball or a single gzipped file)."""
+    try:
+        with tarfile.open(fileobj=io.BytesIO(content), mode="r:*") as archive:
+            for member in archive.getmembers():
+                if member.isfile() and member.name.endswith(".tex"):
+                    yield archive.extractfile(member).read().decode("utf-8", errors="ignore")
+        return
+    except tarfile.TarError:
+        pass
+    try:
+        # single-file submissions are served as one gzipped .tex
+        yield gzip.decompress(content).decode("utf-8", errors="ignore")
+    except OSError:
+        return # PDF-only submission, no source
+
+
+def find_repo_in_latex(arxiv_id):
+    """Download the e-print and look for a single GitHub repo, introduced as the paper's own, in its \\url{} / \\href{} commands."""
+    try:
+        response = metrics.http_get(EPRINT_URL.format(arxiv_id=arxiv_id))
+    except requests.exceptions.RequestException as e:
+        logging.info(f"find_repo_in_latex: {arxiv_id}, Failed to download e-print: {e}")
+        return None
+    if response.status_code != 200:
+        logging.info(f"find_repo_in_latex: {arxiv_id}, Failed to download e-print: {response.status_code}")
+        return None
+
+    sources = []
+    for source in latex_sources(response.content):
+        source = re.sub(r"(?<!\\)%.*", "", source) # drop LaTeX comments
+        bibliography = BIBLIOGRAPHY_PATTERN.search(source)
+        if bibliography is not None:
+            source = source[:bibliography.start()]
+        sources.append(source)
+    return own_repo("\n\n".join(sources), LATEX_LINK_PATTERN)
+
+
+def discover_github_link(arxiv_id, abstract, comment, links, use_latex=False):
+    """
+    Return the paper's GitHub link if its metadata (or LaTeX source, when use_latex is set)
+    names exactly one repo and introduces it as the paper's code. Returns None when the
+    PDF + LLM path has to decide.
+    """
+    github_link = find_repo_in_metadata(abstract, comment, links)
+    if github_link is None and use_latex:
+        github_link = find_repo_in_latex(arxiv_id)
+    return github_link
@@ -0,0 +1,220 @@
+# star_refresh.py
+# Today's star count for every tracked repo, fetched by one or more workers, each with its
+# own GitHub tokens:
+#
+#   - repos are split into `shards` shards by crc32 of the repo id, so a repo always falls
+#     in the same shard;
+#   - a worker claims a shard with a lease in the star_refresh_leases table. It renews the
+#     lease with every chunk of counts it writes, and before it sleeps for a token budget to
+#     reset, and marks the shard done at the end. If a worker crashes, its lease expires and
+#     another worker takes the shard over;
+#   - the shard workers start at rotates with the date, so when the tokens run out it is not
+#     always the same shards that go without a count;
+#   - counts go into star_counts with INSERT OR REPLACE on UNIQUE(paper_id, check_date), so
+#     a shard that is taken over halfway can simply be fetched again. Shards that are done
+#     are not fetched again on the same day.
+#
+# Workers share the SQLite database: processes on one host, or hosts that mount the same disk.
+#
+#   python -m scripts.star_refresh --workers 4      # 4 local processes; tokens from STAR_API_KEYS
+#   python -m scripts.star_refresh --worker host-b  # one more worker, e.g. on another host
+import os
+import re
+import time
+import zlib
+import socket
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from datetime import date
+
+from scripts import metrics
+from scripts.star_scraper import fetch_repo_stars, TokenPool, RateLimitExhausted
+from scripts.database import update_repo_identity
+
+SHARDS = 16
+LEASE_SECONDS = 600
+CHUNK_SIZE = 100 # repos fetched (and written) between lease renewals; one GraphQL batch
+
+
+def load_tokens():
+    """GitHub tokens from STAR_API_KEYS (comma or whitespace separated), else STAR_API_KEY."""
+    tokens = re.split(r"[\s,]+", os.getenv("STAR_API_KEYS", "").strip())
+    return [token for token in tokens if token] or [token for token in [os.getenv("STAR_API_KEY")] if token]
+
+
+def shard_of(repo_id, shards=SHARDS):
+    return zlib.crc32(str(repo_id).encode()) % shards
+
+
+def start_shard(check_date, shards=SHARDS, offset=0):
+    """The shard a worker starts at: `offset` shards past one that moves on by one every day."""
+    return (date.fromisoformat(check_date).toordinal() + offset) % shards
+
+
+def _create_lease_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS star_refresh_leases (
+            check_date TEXT,
+            shard INTEGER,
+            worker TEXT,
+            expires_at REAL,
+            done_at REAL,
+            PRIMARY KEY (check_date, shard)
+        )
+    ''')
+    conn.commit()
+
+
+def claim_shard(conn, check_date, worker, shards=SHARDS, lease_seconds=LEASE_SECONDS, preferred=0):
+    """
+    Take a lease on a shard of check_date that is not done and not leased by another live
+    worker, starting the search at `preferred`. Returns the shard, or None if there is none.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    leases = {row[0]: row[1:] for row in conn.execute(
+        "SELECT shard, worker, expires_at, done_at FROM star_refresh_leases WHERE check_date = ?", (check_date,))}
+    for shard in sorted(range(shards), key=lambda shard: (shard - preferred) % shards):
+        holder, expires_at, done_at = leases.get(shard, (None, 0, None))
+        if done_at is None and (expires_at < now or holder == worker):
+            if holder is not None and holder != worker:
+                logging.info(f"{worker} takes over shard {shard} of {check_date} from {holder}")
+            conn.execute("INSERT OR REPLACE INTO star_refresh_leases (check_date, shard, worker, expires_at, done_at) "
+                         "VALUES (?, ?, ?, ?, NULL)", (check_date, shard, worker, now + lease_seconds))
+            conn.commit()
+            return shard
+    conn.commit()
+    return None
+
+
+def pending_shards(conn, check_date, shards=SHARDS):
+    """Number of shards of check_date that are not done yet."""
+    _create_lease_table(conn)
+    done = conn.execute("SELECT COUNT(*) FROM star_refresh_leases WHERE check_date = ? AND done_at IS NOT NULL",
+                        (check_date,)).fetchone()[0]
+    return shards - done
+
+
+def _repos_in_shard(conn, shard, shards):
+    rows = conn.execute("SELECT id, owner, name, node_id FROM repos WHERE id IN (SELECT repo_id FROM papers) ORDER BY id")
+    return [row for row in rows if shard_of(row[0], shards) == shard]
+
+
+def _extend_lease(conn, check_date, shard, worker, seconds):
+    conn.execute("UPDATE star_refresh_leases SET expires_at = ? WHERE check_date = ? AND shard = ? AND worker = ?",
+                 (time.time() + seconds, check_date, shard, worker))
+
+
+def _write_counts(conn, results, check_date, shard, worker, lease_seconds):
+    """Record one chunk of fetched counts and extend the lease, in one transaction."""
+    with metrics.timer("db_write_seconds", table="star_counts"):
+        conn.execute("BEGIN IMMEDIATE")
+        star_updates = []
+        for repo_id, info in results.items():
+            # A 301 (rename/transfer) gives us the canonical identity; store it so the
+            # next refresh goes straight to the right repo.
+            repo_id = update_repo_identity(conn, repo_id, info["owner"], info["name"], info["node_id"])
+            star_updates.append((check_date, info["stars"], repo_id))
+        # REPLACE keeps this idempotent when a shard is fetched again after a crash.
+        conn.executemany('''
+            INSERT OR REPLACE INTO star_counts (paper_id, check_date, stars)
+            SELECT id, ?, ? FROM papers WHERE repo_id = ?
+        ''', star_updates)
+        _extend_lease(conn, check_date, shard, worker, lease_seconds)
+        conn.commit()
+
+
+def run_worker(db_path, worker, tokens, check_date, shards=SHARDS, lease_seconds=LEASE_SECONDS, preferred=None):
+    """
+    Claim and refresh shards until none are left (or the tokens run out of budget), starting
+    at `preferred` (default: the start shard of check_date).
+    Without tokens every repo gets one unauthenticated REST attempt, as before the pool.
+    Returns (repos refreshed, repos that failed).
+    """
+    if not tokens:
+        logging.warning(f"{worker}: no GitHub tokens configured; fetching unauthenticated")
+    if preferred is None:
+        preferred = start_shard(check_date, shards)
+    refreshed = failed = 0
+    with sqlite3.connect(db_path, timeout=60) as conn:
+        shard = None
+
+        def keep_lease(wait):
+            # The pool may sleep longer than the lease lasts; keep the shard from being taken over meanwhile.
+            if shard is not None:
+                _extend_lease(conn, check_date, shard, worker, wait + lease_seconds)
+                conn.commit()
+
+        pool = TokenPool(tokens, on_wait=keep_lease) if tokens else None
+        _create_lease_table(conn)
+        while (shard := claim_shard(conn, check_date, worker, shards, lease_seconds, preferred)) is not None:
+            repos = _repos_in_shard(conn, shard, shards)
+            try:
+                for i in range(0, len(repos), CHUNK_SIZE):
+                    chunk = repos[i:i + CHUNK_SIZE]
+                    results = fetch_repo_stars(chunk, token=pool)
+                    _write_counts(conn, results, check_date, shard, worker, lease_seconds)
+                    refreshed += len(results)
+                    failed += len(chunk) - len(results)
+            except RateLimitExhausted as e:
+                # Hand the shard back right away; a worker with budget left (or the next run) finishes it.
+                logging.warning(f"{worker}: {e}; releasing shard {shard} of {check_date}")
+                conn.execute("UPDATE star_refresh_leases SET expires_at = 0 WHERE check_date = ? AND shard = ? AND worker = ?",
+                             (check_date, shard, worker))
+                conn.commit()
+                break
+            conn.execute("UPDATE star_refresh_leases SET done_at = ? WHERE check_date = ? AND shard = ? AND worker = ?",
+                         (time.time(), check_date, shard, worker))
+            conn.commit()
+    return refreshed, failed
+
+
+def _run_worker(arguments):
+    return run_worker(*arguments)
+
+
+def refresh_stars(db_path, tokens, workers=1, check_date=None, shards=SHARDS, lease_seconds=LEASE_SECONDS):
+    """
+    Refresh the star counts of check_date (default today) with `workers` local processes.
+    With at least as many tokens as workers each worker gets its own tokens; otherwise they
+    share them. Returns (repos refreshed, repos that failed, shards still pending).
+    """
+    check_date = check_date or date.today().isoformat()
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    if workers <= 1:
+        refreshed, failed = run_worker(db_path, host, tokens, check_date, shards, lease_seconds)
+    else:
+        jobs = [(db_path, f"{host}/{i}", tokens[i::workers] if len(tokens) >= workers else tokens,
+                 check_date, shards, lease_seconds, start_shard(check_date, shards, i * shards // workers))
+                for i in range(workers)]
+        with multiprocessing.Pool(workers) as processes:
+            counts = processes.map(_run_worker, jobs)
+        refreshed, failed = sum(count[0] for count in counts), sum(count[1] for count in counts)
+    with sqlite3.connect(db_path) as conn:
+        pending = pending_shards(conn, check_date, shards)
+    metrics.inc("repos_refreshed_total", refreshed)
+    metrics.inc("repos_failed_total", failed)
+    metrics.set_gauge("star_refresh_pending_shards", pending)
+    return refreshed, failed, pending
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "arxiv.db"))
+    parser.add_argument("--workers", type=int, default=1, help="Local worker processes.")
+    parser.add_argument("--worker", type=str, default=None, help="Run one worker under this name (e.g. on another host).")
+    parser.add_argument("--check_date", type=str, default=None, help="Date to record the counts under (default: today).")
+    parser.add_argument("--shards", type=int, default=SHARDS, help="Must be the same for every worker of a day.")
+    args = parser.parse_args()
+
+    if args.worker:
+        check_date = args.check_date or date.today().isoformat()
+        refreshed, failed = run_worker(args.db, args.worker, load_tokens(), check_date, args.shards,
+                                       preferred=start_shard(check_date, args.shards, shard_of(args.worker, args.shards)))
+        with sqlite3.connect(args.db) as conn:
+            pending = pending_shards(conn, check_date, args.shards)
+    else:
+        refreshed, failed, pending = refresh_stars(args.db, load_tokens(), args.workers, args.check_date, args.shards)
+    print(f"Refreshed {refreshed} repos, {failed} failed, {pending} shards pending.")
@@ -1,7 +1,11 @@
-import requests
 from urllib.parse import urlparse
 import logging
 import os
+import re
+import time
+from tqdm import tqdm
+
+from scripts import metrics
 
 
 logging.basicConfig(level=logging.INFO,
@@ -9,39 +13,224 @@ logging.basicConfig(level=logging.INFO,
                     filemode='a',
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GRAPHQL_BATCH_SIZE = 100 # GitHub's limit for the nodes(ids: ...) query
+
+# First path segments on github.com that are site pages, not users/organisations.
+RESERVED_OWNERS = {"orgs", "topics", "features", "marketplace", "sponsors", "settings", "login", "about", "collections"}
+REPO_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+GRAPHQL_QUERY = """
+query($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on Repository { id name owner { login } stargazerCount }
+  }
+}
+"""
+
+def normalize_github_link(github_link):
+    """
+    Reduce the different forms a repo URL shows up in (trailing `.git`, `/tree/main`,
+    `www.`, missing scheme, trailing punctuation) to an (owner, name) pair.
+    Returns None if the link does not point at a GitHub repository.
+    """
+    if not github_link or "github.com" not in github_link.lower():
+        return None
+    link = github_link.strip()
+    if "://" not in link:
+        link = "https://" + link
+
+    parsed_url = urlparse(link)
+    if parsed_url.netloc.lower() not in ("github.com", "www.github.com"):
+        return None
+    parts = [part for part in parsed_url.path.split("/") if part]
+    if len(parts) < 2:
+        return None
+
+    owner, name = parts[0], parts[1].rstrip(".,;:)]}'\"")
+    if name.lower().endswith(".git"):
+        name = name[:-4]
+    if owner.lower() in RESERVED_OWNERS:
+        return None
+    if not REPO_NAME_PATTERN.match(owner) or not REPO_NAME_PATTERN.match(name):
+        return None
+    return owner, name
+
+def record_rate_limit(response, api):
+    """Keep track of the remaining GitHub API budget reported in the response headers."""
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is not None:
+        metrics.set_gauge("github_rate_limit_remaining", int(remaining), api=api)
+
+def is_rate_limited(response):
+    """GitHub answers a spent budget (or a secondary rate limit) with 403 or 429."""
+    return response.status_code in (403, 429) and (
+        response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers)
+
+class RateLimitExhausted(Exception):
+    """Every token in a TokenPool is out of budget for longer than the pool may wait."""
+
+class TokenPool:
+    """
+    Several GitHub tokens, each with its own rate-limit budget per API (REST and GraphQL are
+    counted separately). acquire() hands out the token with the most calls left, as last
+    reported by GitHub; a token we have not used yet counts as full. When every token is
+    spent it waits for the earliest reset, or raises RateLimitExhausted if that is more than
+    max_wait seconds away. on_wait(seconds), if given, is called before every such wait.
+    """
+    def __init__(self, tokens, max_wait=900, on_wait=None):
+        self.tokens = [token for token in tokens if token]
+        self.max_wait = max_wait
+        self.on_wait = on_wait
+        self.budgets = {} # (token, api) -> (remaining, reset time as epoch seconds)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def acquire(self, api):
+        while True:
+            now = time.time()
+            best, best_remaining, next_reset = None, -1, None
+            for token in self.tokens:
+                remaining, reset = self.budgets.get((token, api), (None, 0))
+                if remaining is None or reset <= now:
+                    remaining = float("inf")
+                elif remaining == 0:
+                    next_reset = reset if next_reset is None else min(next_reset, reset)
+                if remaining > best_remaining:
+                    best, best_remaining = token, remaining
+            if best_remaining > 0:
+                return best
+            if next_reset is None:
+                raise RateLimitExhausted(f"no {api} tokens in the pool")
+            wait = next_reset - now + 1
+            if wait > self.max_wait:
+                raise RateLimitExhausted(f"all {len(self.tokens)} tokens are out of {api} budget for {wait:.0f}s")
+            if self.on_wait is not None:
+                self.on_wait(wait)
+            metrics.sleep(wait, reason=f"github_{api}")
+
+    def record(self, token, api, response):
+        """Update the token's budget from the response headers."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = float(response.headers.get("X-RateLimit-Reset") or 0)
+        if "Retry-After" in response.headers and response.status_code in (403, 429):
+            remaining, reset = 0, time.time() + float(response.headers["Retry-After"])
+        if remaining is not None:
+            self.budgets[(token, api)] = (int(remaining), reset)
+
+def _send(send, token, api):
+    """
+    Call send(token) -> response, where `token` is a token, None or a TokenPool. With a pool,
+    a request that hits a spent budget is retried on the next token with calls left. An empty
+    pool is the same as None: one unauthenticated attempt.
+    """
+    if isinstance(token, TokenPool) and not token:
+        token = None
+    pool = token if isinstance(token, TokenPool) else None
+    while True:
+        current = pool.acquire(api) if pool is not None else token
+        response = send(current)
+        record_rate_limit(response, api)
+        if pool is None:
+            return response
+        pool.record(current, api, response)
+        if not is_rate_limited(response):
+            return response
+
+def crawl_repo(owner, name, token):
+    """
+    Fetch a repo from the REST API. Renamed/transferred repos answer with a 301,
+    which requests follows, so the returned owner/name is the canonical identity.
+    Returns a dict with stars, owner, name and node_id, or None on failure.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{name}"
+    response = _send(lambda token: metrics.http_get(url, headers={"Authorization": f"token {token}"} if token else {}),
+                     token, "rest")
+    if response.status_code != 200:
+        logging.info(f"{url}Error: {response.status_code} - {response.json().get('message', 'Unknown error')}")
+        return None
+
+    data = response.json()
+    if response.history:
+        logging.info(f"{url} redirected to {data['full_name']}")
+    return {
+        "stars": data['stargazers_count'],
+        "owner": data['owner']['login'],
+        "name": data['name'],
+        "node_id": data['node_id'],
+    }
+
+def crawl_repos_graphql(node_ids, token):
+    """
+    Fetch up to GRAPHQL_BATCH_SIZE repos in a single GraphQL call, looked up by node id
+    (node ids survive renames). Returns {node_id: repo dict} for the repos that resolved.
+    """
+    response = _send(lambda token: metrics.http_post(f"{GITHUB_API_URL}/graphql",
+                                                     json={"query": GRAPHQL_QUERY, "variables": {"ids": list(node_ids)}},
+                                                     headers={"Authorization": f"bearer {token}"}),
+                     token, "graphql")
+    if response.status_code != 200:
+        logging.info(f"graphql Error: {response.status_code} - {response.text[:200]}")
+        return {}
+
+    payload = response.json()
+    for error in payload.get("errors", []):
+        # NOT_FOUND errors for deleted repos come back next to the data of the other nodes
+        logging.info(f"graphql Error: {error.get('message')}")
+    results = {}
+    for node in (payload.get("data") or {}).get("nodes") or []:
+        if node:
+            results[node["id"]] = {
+                "stars": node["stargazerCount"],
+                "owner": node["owner"]["login"],
+                "name": node["name"],
+                "node_id": node["id"],
+            }
+    return results
+
+def fetch_repo_stars(repos, token):
+    """
+    Fetch the current star count for every unique repo.
+    `repos` is a list of (repo_id, owner, name, node_id); `token` is a token or a TokenPool.
+    Repos with a known node id are batched through GraphQL; the rest (and any GraphQL misses)
+    go through REST one by one. Returns {repo_id: repo dict}.
+    """
+    results = {}
+    pending = []
+    with_node_id = [repo for repo in repos if repo[3]] if token else []
+    for i in range(0, len(with_node_id), GRAPHQL_BATCH_SIZE):
+        batch = with_node_id[i:i + GRAPHQL_BATCH_SIZE]
+        found = crawl_repos_graphql([repo[3] for repo in batch], token)
+        for repo in batch:
+            if repo[3] in found:
+                results[repo[0]] = found[repo[3]]
+            else:
+                pending.append(repo)
+    pending.extend(repo for repo in repos if not (token and repo[3]))
+
+    for repo_id, owner, name, _ in tqdm(pending, desc="Checking GitHub repos"):
+        info = crawl_repo(owner, name, token)
+        if info is not None:
+            results[repo_id] = info
+    return results
+
 def crawl_star(github_link, token):
     
     if "/" not in github_link:
         return ""
-    
-    parsed_url = urlparse(github_link)
-    parts = parsed_url.path.strip("/").split("/")
-    
-    if len(parts) >= 2:
-        username, repo_name = parts[0], parts[1]
-    else:
-        return "Error: Invalid GitHub URL"
 
-    if username is None or repo_name is None:
+    repo = normalize_github_link(github_link)
+    if repo is None:
         return "Error: Invalid GitHub URL"
 
-    else:
-        url = f"https://api.github.com/repos/{username}/{repo_name}"
-        # Set up headers for authentication (optional)
-        headers = {"Authorization": f"token {token}"} if token else {}
-        # Send GET request to GitHub API
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            return data['stargazers_count']
-        else:
-            logging.info(f"{url}Error: {response.status_code} - {response.json().get('message', 'Unknown error')}")
-
-            return None
+    info = crawl_repo(*repo, token)
+    if info is None:
+        return None
+    return info["stars"]
 
 import pandas as pd
 from datetime import date
-from tqdm import tqdm
 def star_scraper(input_file, output_file, token = os.getenv("GITHUB_API_KEY")):
     today = date.today()
     tqdm.pandas(desc="Crawling GitHub Stars")
@@ -0,0 +1,110 @@
+# trends.py
+# Trending detection over the star history. For every repo we keep running statistics of its
+# daily star gain (Welford's mean and M2) in repo_trends, and fold in one new day at a time
+# instead of rescanning star_counts. A repo is trending when today's gain is far above its
+# own history (z-score), so a small repo that suddenly takes off outranks a big one that grows
+# at its usual pace.
+import math
+from datetime import date
+
+# Deltas a repo needs before it gets a score; the first days of a newly tracked repo say
+# nothing about what is normal for it.
+MIN_HISTORY = 3
+# Added to the variance so repos with an almost flat history don't get huge scores for +2 stars.
+VARIANCE_PRIOR = 1.0
+
+
+def fold_day(state, check_date, stars, days):
+    """
+    Fold one observation into a repo's trend state and return the new state. `days` is the
+    gap since the previous observation; gains are per day so a missed refresh doesn't look
+    like a spike. State keys: last_date, last_stars, velocity, acceleration, n, mean, m2, score.
+    """
+    if state is None or state["last_stars"] is None:
+        return {"last_date": check_date, "last_stars": stars, "velocity": None, "acceleration": None,
+                "n": 0, "mean": 0.0, "m2": 0.0, "score": None}
+    velocity = (stars - state["last_stars"]) / max(days, 1)
+    # Score today's gain against the history before today.
+    score = None
+    if state["n"] >= MIN_HISTORY:
+        variance = state["m2"] / (state["n"] - 1)
+        score = (velocity - state["mean"]) / math.sqrt(variance + VARIANCE_PRIOR)
+    n = state["n"] + 1
+    delta = velocity - state["mean"]
+    mean = state["mean"] + delta / n
+    return {
+        "last_date": check_date, "last_stars": stars, "velocity": velocity,
+        "acceleration": velocity - state["velocity"] if state["velocity"] is not None else None,
+        "n": n, "mean": mean, "m2": state["m2"] + delta * (velocity - mean), "score": score,
+    }
+
+
+def _days_between(earlier, later):
+    return (date.fromisoformat(later) - date.fromisoformat(earlier)).days
+
+
+def update_trends(conn):
+    """
+    Fold every star count newer than its repo's trend state into repo_trends, oldest first (on
+    an empty table this is the full backfill). The state is per repo, so counts recorded late
+    for a date other repos already have (e.g. a second refresh run finishing its shards) are
+    still folded. Returns the number of dates folded.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM repo_trends WHERE repo_id NOT IN (SELECT id FROM repos)") # merged repos
+    columns = ("last_date", "last_stars", "velocity", "acceleration", "n", "mean", "m2", "score")
+    states = {row[0]: dict(zip(columns, row[1:]))
+              for row in cursor.execute(f"SELECT repo_id, {', '.join(columns)} FROM repo_trends")}
+    since = min((state["last_date"] for state in states.values()), default="")
+    # Repos with a state: only dates after the oldest state, found through the date index.
+    # Repos without one: their whole history. Every paper of a repo gets the same count, so
+    # one per repo and date is enough.
+    cursor.execute('''
+        SELECT p.repo_id, s.check_date, MAX(s.stars) FROM star_counts s
+        JOIN papers p ON p.id = s.paper_id
+        JOIN repo_trends t ON t.repo_id = p.repo_id
+        WHERE s.check_date > ? AND s.check_date > t.last_date
+        GROUP BY p.repo_id, s.check_date
+        UNION ALL
+        SELECT p.repo_id, s.check_date, MAX(s.stars) FROM papers p
+        CROSS JOIN star_counts s ON s.paper_id = p.id -- papers first, then their counts by index
+        WHERE p.repo_id IS NOT NULL AND p.repo_id NOT IN (SELECT repo_id FROM repo_trends)
+        GROUP BY p.repo_id, s.check_date
+        ORDER BY 2, 1
+    ''', (since,))
+    folded, dates = set(), set()
+    for repo_id, check_date, stars in cursor:
+        state = states.get(repo_id)
+        days = _days_between(state["last_date"], check_date) if state else 1
+        states[repo_id] = fold_day(state, check_date, stars, days)
+        folded.add(repo_id)
+        dates.add(check_date)
+    cursor.executemany(f'''
+        INSERT OR REPLACE INTO repo_trends (repo_id, {', '.join(columns)})
+        VALUES ({', '.join('?' * (len(columns) + 1))})
+    ''', [(repo_id, *(states[repo_id][column] for column in columns)) for repo_id in folded])
+    conn.commit()
+    return len(dates)
+
+
+def top_trending(conn, k=20, check_date=None):
+    """
+    The k most anomalous repos on check_date (default: the latest folded date), with their
+    papers. Reads k rows off the (last_date, score) index, so it doesn't depend on corpus size.
+    """
+    if check_date is None:
+        check_date = conn.execute("SELECT MAX(last_date) FROM repo_trends").fetchone()[0]
+    return conn.execute('''
+        SELECT
+            p.title AS "Title",
+            p.pdf_link AS "Pdf_Link",
+            p.github_link AS "Github_Link",
+            p.arxiv_id AS "Arxiv_ID",
+            t.last_stars AS current_stars,
+            t.velocity,
+            t.acceleration,
+            t.score AS trend_score
+        FROM (SELECT * FROM repo_trends WHERE last_date = ? AND score IS NOT NULL ORDER BY score DESC LIMIT ?) t
+        JOIN papers p ON p.repo_id = t.repo_id
+        ORDER BY t.score DESC, p.id
+    ''', (check_date, k)).fetchall()
@@ -0,0 +1,98 @@
+# warm_start.py
+# A small snapshot of what the viewer needs for its most common request (the default ranking
+# of the latest day): the list of available dates and the first pages of that ranking. It is
+# built at the end of dataset_update.py (and in the Render build), and loaded once by the app,
+# so a freshly started worker can answer "/" without scanning star_counts.
+#
+#   python -m scripts.warm_start                    # rebuild data/warm_start.json from data/arxiv.db
+import os
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+from scripts.database import ranking_query
+from scripts.snapshots import available_dates
+
+FORMAT_VERSION = 2
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+WARM_START_PATH = os.path.join(DATA_DIR, "warm_start.json")
+# The ranking the snapshot holds: the app's defaults.
+DEFAULT_GROWTH_DAYS, DEFAULT_SORT_COLUMN, DEFAULT_ORDER = 1, "current_stars", "DESC"
+
+
+def database_signature(db_path):
+    """Size and modification time of the database file; any write changes it."""
+    stat = os.stat(db_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build(db_path, path=WARM_START_PATH, rows=250):
+    """Write the snapshot for db_path to path, with the first `rows` rows of the default ranking."""
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        dates = available_dates(conn)
+        latest = None
+        if dates:
+            ranking = conn.execute(ranking_query(DEFAULT_GROWTH_DAYS, DEFAULT_SORT_COLUMN, DEFAULT_ORDER),
+                                   (dates[0], dates[0])).fetchall()
+            latest = {"date": dates[0], "total_items": len(ranking), "rows": [dict(row) for row in ranking[:rows]]}
+    state = {
+        "format": FORMAT_VERSION,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        # read after the queries, the connection is closed and nothing wrote to the file
+        "database": database_signature(db_path),
+        "available_dates": dates,
+        "latest": latest,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return state
+
+
+def load(path=WARM_START_PATH):
+    """Read the snapshot at path, or None if there is none (or it is unreadable or of another format)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("format") == FORMAT_VERSION else None
+
+
+def current(state, db_path):
+    """Return state if it was built from db_path as it is now, else None."""
+    if state is None:
+        return None
+    try:
+        return state if state["database"] == database_signature(db_path) else None
+    except OSError:
+        return None
+
+
+def ranking_rows(state, selected_date, growth_days, sort_column, order_direction, end_index):
+    """
+    Return (rows, total_items) for a ranking request the snapshot can answer: the default
+    ranking of its date, up to row end_index. None means the database has to be queried.
+    """
+    latest = state["latest"]
+    if (latest is None or selected_date != latest["date"] or growth_days != DEFAULT_GROWTH_DAYS
+            or sort_column != DEFAULT_SORT_COLUMN or order_direction != DEFAULT_ORDER):
+        return None
+    if end_index > len(latest["rows"]) and len(latest["rows"]) < latest["total_items"]:
+        return None
+    return latest["rows"], latest["total_items"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=os.path.join(DATA_DIR, "arxiv.db"))
+    parser.add_argument("--output", type=str, default=WARM_START_PATH)
+    parser.add_argument("--rows", type=int, default=250, help="Rows of the latest default ranking to keep.")
+    args = parser.parse_args()
+
+    state = build(args.db, args.output, args.rows)
+    print(f"Wrote {args.output}: {len(state['available_dates'])} dates, "
+          f"{len(state['latest']['rows']) if state['latest'] else 0} ranking rows.")